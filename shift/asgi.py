@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The roster event stream (/events/roster/) is an async streaming view and needs to be served
+from here by an ASGI server, e.g. `uvicorn shift.asgi:application`; under WSGI the stream
+would tie up a worker thread per open browser tab.
 """
 
 import os
@@ -113,10 +113,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # take the write lock when a transaction starts, so concurrent payroll workers
+            # queue up instead of failing with "database is locked" (see payroll.claim_unpaid_shifts)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Cache
+# on disk, so the web processes and the celery workers see each other's invalidations and
+# ETag version counters (shiftapp/caching.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'default',
+    },
+    # month-scoped roster responses (shiftapp/roster_cache.py), evicted per month on writes
+    'roster': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'roster',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -174,6 +198,8 @@ from django.conf import settings
 CELERY_TIMEZONE = 'Australia/Sydney'
 
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
+# chord callbacks and backfill progress need a result backend
+CELERY_RESULT_BACKEND = 'redis://localhost:6379/1'
 # 使用 Django 資料庫來儲存排程
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers.DatabaseScheduler'
 
@@ -213,3 +239,34 @@ LOGGING = {
         },
     },
 }
+
+# roster solver's setting
+ROSTER_MAX_WEEKLY_HOURS = 38
+ROSTER_MAX_WEEKLY_SHIFTS = 4
+ROSTER_MIN_REST_HOURS = 10
+
+# payroll's setting: 'rates' applies penalty rates and weekly overtime,
+# 'set' computes flat wages in SQL (INSERT ... SELECT), 'python' flat wages row by row
+PAYROLL_MODE = 'rates'
+# shifts claimed (and locked) per payroll transaction
+PAYROLL_BATCH_SIZE = 1000
+# a 'running' PayRun without progress for this long lost its worker and is resumed
+PAY_RUN_STALE_MINUTES = 60
+
+# penalty rates, multiplied on top of pay_rate (and casual loading)
+PAY_RATE_MULTIPLIERS = {
+    'weekday': '1.00',
+    'saturday': '1.25',
+    'sunday': '1.50',
+    'holiday': '2.25',
+}
+# hours in a pay week (Mon - Sun) before overtime starts, then (tier hours, multiplier),
+# None = the rest of the week
+OVERTIME_THRESHOLD_HOURS = 38
+OVERTIME_TIERS = [
+    (2, '1.50'),
+    (None, '2.00'),
+]
+
+# generated payslips (html / csv) are written here, one folder per pay period
+PAYSLIP_ROOT = BASE_DIR / 'payslips'
@@ -6,6 +6,7 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from shiftapp.views import PasswordResetRequestView, PasswordResetConfirmView, PasswordResetTokenValidateView
+from shiftapp.views import roster_events
 from shiftapp.views import MemberViewSet, ShiftViewSet, StaffShiftViewSet, LeaveRequestViewSet, LeaveBalanceViewSet, WageViewSet
 
 router = DefaultRouter()
@@ -28,4 +29,7 @@ urlpatterns = [
     path('api/password-reset/', PasswordResetRequestView.as_view(), name='password_reset'),
     path('api/password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('api/password-reset/validate/', PasswordResetTokenValidateView.as_view(), name='password_reset_validate'),
+
+    # 班表 / 請假即時推播 (Server-Sent Events)
+    path('events/roster/', roster_events, name='roster_events'),
 ]
\ No newline at end of file
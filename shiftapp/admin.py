@@ -1,6 +1,6 @@
 from datetime import datetime
 from django.contrib import admin
-from .models import Members, Shift, StaffShift
+from .models import Members, Shift, StaffShift, PayRun, PublicHoliday, WageRollup
 
 
 @admin.register(Members)
@@ -53,4 +53,43 @@ class StaffShiftAdmin(admin.ModelAdmin):
         weekday_index = obj.shift_date.weekday()
         return weekdays[weekday_index]
     days.short_description = "Days"
-        
\ No newline at end of file
+
+
+@admin.register(PayRun)
+class PayRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "start_date",
+        "end_date",
+        "status",
+        "rows_processed",
+        "last_checkpoint",
+        "checkpoint_at",
+        "started_at",
+        "finished_at",
+    )
+    list_filter = ("kind", "status")
+
+
+@admin.register(PublicHoliday)
+class PublicHolidayAdmin(admin.ModelAdmin):
+    list_display = (
+        "holiday_date",
+        "name",
+    )
+
+
+@admin.register(WageRollup)
+class WageRollupAdmin(admin.ModelAdmin):
+    list_display = (
+        "staff",
+        "period_type",
+        "period_start",
+        "period_end",
+        "shifts",
+        "hours",
+        "salary",
+        "tax_withheld",
+    )
+    list_filter = ("period_type",)
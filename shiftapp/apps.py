@@ -4,4 +4,7 @@ from django.apps import AppConfig
 
 class ShiftappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'shiftapp'
\ No newline at end of file
+    name = 'shiftapp'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,62 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import Wage
+
+WAGE_DATE_RANGE_KEY = 'shiftapp:wage-date-range'
+# bulk Wage writes invalidate it by hand, the timeout bounds one that was missed
+WAGE_DATE_RANGE_TIMEOUT = 3600
+
+
+def wage_date_range():
+    """
+    (first, last) shift_date in the whole Wage table, cached until Wage rows are written or for
+    at most WAGE_DATE_RANGE_TIMEOUT seconds.
+    """
+    value = cache.get(WAGE_DATE_RANGE_KEY)
+    if value is None:
+        dates = Wage.objects.aggregate(first=Min('shift_date'), last=Max('shift_date'))
+        value = (dates['first'], dates['last'])
+        cache.set(WAGE_DATE_RANGE_KEY, value, WAGE_DATE_RANGE_TIMEOUT)
+    return value
+
+
+def invalidate_wage_date_range():
+    # again on commit, a read before then may have cached the range without the new rows
+    cache.delete(WAGE_DATE_RANGE_KEY)
+    transaction.on_commit(lambda: cache.delete(WAGE_DATE_RANGE_KEY))
+
+
+# resources with a version counter, bumped whenever a row of them changes
+VERSIONED_RESOURCES = ['staffshift', 'shift', 'members', 'leaverequest']
+RESOURCE_VERSION_KEY = 'shiftapp:version:{}'
+
+
+def resource_version(resource):
+    """
+    (token, last modified timestamp) of a resource. A missing counter starts a fresh random
+    token, so a cleared cache can never make an old ETag match again.
+    """
+    key = RESOURCE_VERSION_KEY.format(resource)
+    value = cache.get(key)
+    if value is None:
+        value = (uuid.uuid4().hex, int(time.time()))
+        # add, not set: another request may have created it in the meantime
+        if not cache.add(key, value, None):
+            value = cache.get(key) or value
+    return value
+
+
+def bump_versions(*resources):
+    """
+    Called by the model signals and after bulk writes, which skip them. The bump waits for the
+    commit, otherwise a request in between would tag the old rows with the new version.
+    """
+    def bump():
+        value = (uuid.uuid4().hex, int(time.time()))
+        cache.set_many({RESOURCE_VERSION_KEY.format(resource): value for resource in resources}, None)
+    transaction.on_commit(bump)
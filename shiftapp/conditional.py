@@ -0,0 +1,58 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .caching import resource_version
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for a viewset's GET actions, taken from the version counters of the
+    resources its responses are built from (see caching.py). A poll whose If-None-Match still
+    matches gets 304 right after authentication, before any queryset or serializer runs.
+    """
+    version_resources = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def validators(self, request):
+        versions = [resource_version(resource) for resource in self.version_resources]
+        user = request.user
+        # the same URL shows different rows to different users, and in different renderers
+        seed = '|'.join([
+            request.get_full_path(),
+            str(user.pk), str(user.is_staff), str(user.is_superuser),
+            request.accepted_renderer.format or '',
+        ] + [token for token, _ in versions])
+        etag = f'"{hashlib.md5(seed.encode()).hexdigest()}"'
+        return etag, max(modified for _, modified in versions)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validators = None
+        if request.method in ('GET', 'HEAD') and self.action in self.conditional_actions and self.version_resources:
+            etag, last_modified = self._validators = self.validators(request)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                response['ETag'] = etag
+                raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_validators', None) and response.status_code == 200:
+            etag, last_modified = self._validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # keep it, but ask again every time
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,126 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import StaffShift
+from .roster_solver import StaffTimeline, shift_window
+from .shift_registry import shift_registry
+from .utils import as_date
+
+CONFLICT_MESSAGES = {
+    'overlap': 'overlaps another shift of this staff member',
+    'rest': 'starts or ends less than {} hours from another shift of this staff member',
+}
+
+
+class RosterConflictError(ValueError):
+    def __init__(self, conflicts):
+        super().__init__(f"{len(conflicts)} shift(s) overlap or break the rest gap")
+        self.conflicts = conflicts
+
+
+def worker_of(cover_shift, staff_id, alternative_staff_id):
+    # the person who actually works the shift, same rule as payroll
+    return alternative_staff_id if cover_shift else staff_id
+
+
+class ConflictIndex:
+    """
+    Booked shift windows per worker around a batch of StaffShift writes, loaded with one
+    range query and kept in the solver's StaffTimeline, so every overlap / rest-gap check of
+    the batch is a bisect in memory instead of a query per row.
+    """
+
+    def __init__(self, min_rest_hours=None):
+        if min_rest_hours is None:
+            min_rest_hours = settings.ROSTER_MIN_REST_HOURS
+        self.min_rest_hours = min_rest_hours
+        self.min_rest = timedelta(hours=min_rest_hours)
+        self.timelines = defaultdict(StaffTimeline)
+        self.keys = set()
+
+    @classmethod
+    def for_rows(cls, days, workers=None, exclude_ids=(), min_rest_hours=None):
+        """
+        Load the shifts that could clash with shifts on `days`: the same days plus enough
+        days either side for overnight shifts and the rest gap. Rows in exclude_ids are the
+        ones the batch is about to change or delete.
+        """
+        index = cls(min_rest_hours)
+        days = [day for day in days if day]
+        if days:
+            index.load(min(days) - index.margin(), max(days) + index.margin(), workers, exclude_ids)
+        return index
+
+    def margin(self):
+        # how far a shift can reach into the neighbouring days: overnight end plus the rest gap
+        return timedelta(days=1 + int(self.min_rest_hours) // 24)
+
+    def load(self, start_date, end_date, workers=None, exclude_ids=()):
+        """
+        Add every shift of start_date ~ end_date, one range query on shift_date.
+        """
+        rows = StaffShift.objects.filter(shift_date__range=(start_date, end_date))
+        if workers is not None:
+            rows = rows.filter(Q(cover_shift=False, staff_id__in=workers) |
+                               Q(cover_shift=True, alternative_staff_id__in=workers))
+        if exclude_ids:
+            rows = rows.exclude(id__in=list(exclude_ids))
+
+        for shift_date, shift_id, cover_shift, staff_id, alternative_staff_id in rows.values_list(
+                'shift_date', 'shift_id', 'cover_shift', 'staff_id', 'alternative_staff_id'):
+            self.keys.add((staff_id, shift_date, shift_id))
+            self.add(worker_of(cover_shift, staff_id, alternative_staff_id), shift_date, shift_id)
+        return self
+
+    def window(self, day, shift_id):
+        template = shift_registry.get(shift_id)
+        if template is None or not template.start_time or not template.end_time:
+            return None
+        return shift_window(day, template.start_time, template.end_time)
+
+    def add(self, worker, day, shift_id):
+        window = self.window(day, shift_id)
+        if worker and window:
+            self.timelines[worker].add(*window)
+
+    def check(self, worker, day, shift_id):
+        """
+        'overlap', 'rest' or None for worker taking shift_id on day.
+        """
+        window = self.window(day, shift_id)
+        if not worker or not window:
+            return None
+        return self.timelines[worker].conflict(*window, self.min_rest)
+
+    def message(self, conflict):
+        return CONFLICT_MESSAGES[conflict].format(self.min_rest_hours)
+
+
+def roster_conflicts(staffshifts, min_rest_hours=None, exclude_ids=()):
+    """
+    Check a generated roster (unsaved StaffShift rows) against itself and against what is
+    already saved, leaving out the saved rows in exclude_ids (the ones the roster replaces).
+    A proposed row equal to a saved one (same staff, date and template) is the same row and
+    not a clash. Returns a list of {shift_date, staff, shift, conflict}.
+    """
+    rows = sorted(((as_date(row.shift_date), row) for row in staffshifts),
+                  key=lambda item: (item[0], item[1].staff_id, item[1].shift_id or 0))
+    index = ConflictIndex.for_rows([day for day, _ in rows], exclude_ids=exclude_ids,
+                                   min_rest_hours=min_rest_hours)
+
+    conflicts = []
+    for day, row in rows:
+        if (row.staff_id, day, row.shift_id) in index.keys:
+            continue
+        worker = worker_of(row.cover_shift, row.staff_id, row.alternative_staff_id)
+        conflict = index.check(worker, day, row.shift_id)
+        if conflict:
+            conflicts.append({'shift_date': str(day), 'staff': worker, 'shift': row.shift_id,
+                              'conflict': conflict})
+            continue
+        index.keys.add((row.staff_id, day, row.shift_id))
+        index.add(worker, day, row.shift_id)
+    return conflicts
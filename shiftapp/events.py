@@ -0,0 +1,186 @@
+"""
+Roster / leave change events pushed to the browser with Server-Sent Events.
+
+Django Channels isn't installed, so this is a small in-memory channel layer: model signals
+(which run in whatever thread saved the row) publish compact events to the broker, and every
+open event stream is an asyncio queue on the ASGI event loop, fed with call_soon_threadsafe.
+The broker lives in one process: with several ASGI processes (or roster generation in a
+celery worker) a client only hears about writes made by the process it is connected to.
+"""
+import json
+import asyncio
+import itertools
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .utils import as_date
+
+# events queued for one slow client before it is told to reload instead
+SUBSCRIBER_QUEUE_SIZE = 200
+# a comment line this often keeps proxies from closing an idle stream
+KEEPALIVE_SECONDS = 15
+
+
+def month_key(day):
+    return f"{day.year}-{day.month:02d}"
+
+
+def months_between(start_date, end_date):
+    if not start_date:
+        return set()
+    end_date = end_date or start_date
+    months = set()
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        months.add(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+class Subscription:
+    """
+    One open event stream: which months / staff it wants, and who is listening, since leave
+    requests are only shown to managers and to the person who asked for the leave.
+    """
+
+    def __init__(self, loop, months=(), staff=(), user_id=None, is_staff=False):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.months = set(months)
+        self.staff = set(staff)
+        self.user_id = user_id
+        self.is_staff = is_staff
+        self.overflowed = False
+
+    def wants(self, event, months, staff):
+        if event['type'] == 'leaverequest' and not self.is_staff and self.user_id not in staff:
+            return False
+        # bulk events name months only, they go to every stream of those months
+        if self.months and not self.months & months:
+            return False
+        if self.staff and staff and not self.staff & staff:
+            return False
+        return True
+
+    def put(self, event):
+        # runs on the subscriber's loop
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(event)
+
+
+class EventBroker:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, **filters):
+        subscription = Subscription(asyncio.get_running_loop(), **filters)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event, months=(), staff=()):
+        """
+        Send event to every subscription whose months / staff filters match. Safe from any thread.
+        """
+        months, staff = set(months), {staff_id for staff_id in staff if staff_id}
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions:
+            return
+        event = dict(event, id=next(self._ids))
+        for subscription in subscriptions:
+            if subscription.wants(event, months, staff):
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.put, event)
+                except RuntimeError:
+                    # the loop is closed, the stream is going away
+                    self.unsubscribe(subscription)
+
+
+broker = EventBroker()
+
+
+def publish_on_commit(event, months=(), staff=()):
+    # clients re-fetch on an event, so it must not arrive before the rows are committed
+    transaction.on_commit(lambda: broker.publish(event, months, staff))
+
+
+def staffshift_event(instance, action, old_shift_date=None):
+    event = {
+        'type': 'staffshift',
+        'action': action,
+        'pk': instance.pk,
+        'shift_date': str(instance.shift_date),
+        'staff': instance.staff_id,
+        'shift': instance.shift_id,
+        'cover_shift': instance.cover_shift,
+        'alternative_staff': instance.alternative_staff_id,
+    }
+    months = {month_key(as_date(day)) for day in (instance.shift_date, old_shift_date) if day}
+    publish_on_commit(event, months, [instance.staff_id, instance.alternative_staff_id])
+
+
+def leaverequest_event(instance, action):
+    event = {
+        'type': 'leaverequest',
+        'action': action,
+        'pk': instance.pk,
+        'staff': instance.staff_id,
+        'leave_type': instance.leave_type,
+        'start_date': str(instance.start_date) if instance.start_date else None,
+        'end_date': str(instance.end_date) if instance.end_date else None,
+        'status': instance.status,
+    }
+    publish_on_commit(event, months_between(instance.start_date, instance.end_date), [instance.staff_id])
+
+
+def roster_months_event(months):
+    """
+    One 'roster changed' event per month instead of one per row, the client reloads that month.
+    """
+    for year, month in set(months):
+        publish_on_commit({'type': 'roster', 'action': 'bulk', 'month': f"{year}-{month:02d}"},
+                          [f"{year}-{month:02d}"])
+
+
+def sse_message(event, name=None):
+    name = name or event['type']
+    data = json.dumps(event, cls=DjangoJSONEncoder)
+    if 'id' in event:
+        return f"id: {event['id']}\nevent: {name}\ndata: {data}\n\n"
+    return f"event: {name}\ndata: {data}\n\n"
+
+
+async def event_stream(subscription):
+    """
+    Body of the SSE response. Runs until the client goes away, when the ASGI handler cancels
+    it and the subscription is dropped.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            if subscription.overflowed:
+                # events were dropped, the client has to reload what it shows
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                yield sse_message({'type': 'resync'})
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield sse_message(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,56 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from .models import LeaveRequest
+
+# pending leave is blocked too, otherwise approving it later creates a conflict to fix by hand
+BLOCKING_LEAVE_STATUS = ['approved', 'pending']
+
+
+class LeaveIndex:
+    """
+    In-memory interval index of leave, keyed by staff id.
+
+    Each staff member's leave is merged into sorted, non-overlapping [start, end] date ranges,
+    so checking whether someone is on leave on a given day is a single bisect.
+    """
+
+    def __init__(self, intervals=()):
+        by_staff = defaultdict(list)
+        for staff_id, start, end in intervals:
+            if start and end and start <= end:
+                by_staff[staff_id].append((start, end))
+
+        self.starts = {}
+        self.ends = {}
+        for staff_id, ranges in by_staff.items():
+            merged = []
+            for start, end in sorted(ranges):
+                if merged and start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            self.starts[staff_id] = [start for start, _ in merged]
+            self.ends[staff_id] = [end for _, end in merged]
+
+    @classmethod
+    def for_period(cls, start_date, end_date, status=BLOCKING_LEAVE_STATUS):
+        """
+        Load every leave request overlapping [start_date, end_date] with one query.
+        """
+        rows = LeaveRequest.objects.filter(
+            status__in=status,
+            start_date__lte=end_date,
+            end_date__gte=start_date,
+        ).values_list('staff_id', 'start_date', 'end_date')
+        return cls(rows)
+
+    def is_on_leave(self, staff_id, day):
+        starts = self.starts.get(staff_id)
+        if not starts:
+            return False
+        i = bisect_right(starts, day) - 1
+        return i >= 0 and day <= self.ends[staff_id][i]
+
+    def is_available(self, staff_id, day):
+        return not self.is_on_leave(staff_id, day)
@@ -0,0 +1,180 @@
+import time
+import random
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from shiftapp.models import Members, Shift, StaffShift, Wage, LeaveRequest
+
+# tables of the hot queries below, every secondary index of them is dropped to show the plans
+# without indexes (the older (shift_date, id), foreign key and unique indexes answer them too)
+HOT_QUERY_MODELS = [StaffShift, Wage, LeaveRequest]
+
+BENCH_STAFF = 500
+BENCH_START = date(2020, 1, 1)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Print EXPLAIN plans and timings of the hot payroll / wage / leave queries with and without "
+            "their indexes, on synthetic rows that are rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help="synthetic StaffShift rows to seed")
+        parser.add_argument('--no-seed', action='store_true', help="explain against the existing data only")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows must be positive")
+
+        try:
+            with transaction.atomic():
+                if not options['no_seed']:
+                    started = time.perf_counter()
+                    staff_id, day = self.seed(options['rows'])
+                    self.stdout.write(f"seeded {options['rows']} shifts in {time.perf_counter() - started:.1f}s")
+                else:
+                    staff_id = StaffShift.objects.values_list('staff_id', flat=True).first()
+                    day = StaffShift.objects.values_list('shift_date', flat=True).first()
+                    if staff_id is None:
+                        raise CommandError("no StaffShift rows to explain against, drop --no-seed")
+
+                queries = self.hot_queries(staff_id, day)
+                after = self.explain(queries, 'with indexes')
+
+                dropped = self.drop_indexes()
+                self.stdout.write(f"without indexes means without {', '.join(dropped)}")
+                before = self.explain(queries, 'without indexes')
+
+                for label, _ in queries:
+                    self.stdout.write(self.style.MIGRATE_HEADING(label))
+                    self.stdout.write(f"  without indexes ({before[label][1]:.2f}ms):")
+                    self.stdout.write(self.indent(before[label][0]))
+                    self.stdout.write(f"  with indexes ({after[label][1]:.2f}ms):")
+                    self.stdout.write(self.indent(after[label][0]))
+
+                # undoes the synthetic rows and the dropped indexes alike
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS("rolled back, nothing written"))
+
+    def seed(self, rows):
+        templates = list(Shift.objects.filter(start_time__isnull=False, end_time__isnull=False))
+        if not templates:
+            raise CommandError("create at least one Shift template with start and end time first")
+
+        Members.objects.bulk_create([
+            Members(username=f"bench-{i}", email=f"bench-{i}@example.invalid", password='!')
+            for i in range(BENCH_STAFF)
+        ], batch_size=1000)
+        # bulk_create on SQLite before 3.35 does not return primary keys
+        staff_ids = list(Members.objects.filter(username__startswith='bench-').values_list('id', flat=True))
+
+        # (staff, date, template) is unique, so walk the combinations
+        per_day = len(staff_ids) * len(templates)
+        days = -(-rows // per_day)
+        rng = random.Random(rows)
+
+        def shifts():
+            made = 0
+            for offset in range(days):
+                day = BENCH_START + timedelta(days=offset)
+                for staff_id in staff_ids:
+                    for template in templates:
+                        if made == rows:
+                            return
+                        made += 1
+                        # older shifts are paid, only the recent tail is still open
+                        yield StaffShift(shift_date=day, staff_id=staff_id, shift_id=template.id,
+                                         has_payslip=offset < days - 7)
+
+        batch = []
+        for shift in shifts():
+            batch.append(shift)
+            if len(batch) == 5000:
+                StaffShift.objects.bulk_create(batch)
+                batch = []
+        StaffShift.objects.bulk_create(batch)
+
+        paid = StaffShift.objects.filter(staff_id__in=staff_ids, has_payslip=True).values_list('id', 'staff_id', 'shift_date')
+        batch = []
+        for shift_id, staff_id, shift_date in paid.iterator(chunk_size=5000):
+            batch.append(Wage(staff_id=staff_id, shift_id=shift_id, shift_date=shift_date, pay_date=shift_date))
+            if len(batch) == 5000:
+                Wage.objects.bulk_create(batch)
+                batch = []
+        Wage.objects.bulk_create(batch)
+
+        leave = []
+        for staff_id in staff_ids:
+            for _ in range(20):
+                start = BENCH_START + timedelta(days=rng.randrange(days))
+                leave.append(LeaveRequest(staff_id=staff_id, leave_type='annual', start_date=start,
+                                          end_date=start + timedelta(days=rng.randrange(1, 5)),
+                                          status=rng.choice(['pending', 'approved', 'rejected'])))
+        LeaveRequest.objects.bulk_create(leave, batch_size=5000)
+
+        last_day = BENCH_START + timedelta(days=days - 1)
+        return staff_ids[len(staff_ids) // 2], last_day
+
+    def hot_queries(self, staff_id, day):
+        week_start = day - timedelta(days=6)
+        leave = LeaveRequest.objects.filter(staff_id=staff_id).values_list('start_date', 'end_date').first() or (day, day)
+        return [
+            ("payroll: unpaid shifts of a day",
+             StaffShift.objects.filter(shift_date=day, has_payslip=False)),
+            ("payroll: unpaid shifts of a period",
+             StaffShift.objects.filter(shift_date__range=(week_start, day), has_payslip=False)),
+            ("wages of a staff member over a period",
+             Wage.objects.filter(staff_id=staff_id, shift_date__range=(week_start, day))),
+            ("duplicate leave request check",
+             LeaveRequest.objects.filter(staff_id=staff_id, start_date=leave[0], end_date=leave[1],
+                                         status__in=['pending', 'approved'])),
+        ]
+
+    def drop_indexes(self):
+        dropped = []
+        with connection.cursor() as cursor:
+            for model in HOT_QUERY_MODELS:
+                constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+                for name, constraint in constraints.items():
+                    # StaffShift's unique (staff, shift_date, shift) is part of the table and can't be
+                    # dropped; none of the queries filter on staff first, so it can't answer them
+                    if constraint['index'] and not constraint['primary_key'] and not name.startswith('sqlite_autoindex'):
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+                        dropped.append(name)
+        return dropped
+
+    def explain(self, queries, tag):
+        """
+        Plan and run time of each query. The SQL is tagged with a comment so neither run reuses
+        a statement the connection prepared and cached while the other set of indexes existed.
+        """
+        plans = {}
+        with connection.cursor() as cursor:
+            for label, queryset in queries:
+                sql, params = queryset.query.sql_with_params()
+                sql = f"{sql} /* {tag} */"
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = self.plan_tree(cursor.fetchall())
+                started = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                plans[label] = (plan, (time.perf_counter() - started) * 1000)
+        return plans
+
+    def plan_tree(self, rows):
+        # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail)
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append(f"{'  ' * depth[node_id]}{detail}")
+        return '\n'.join(lines)
+
+    def indent(self, text):
+        return '\n'.join(f"    {line}" for line in text.splitlines())
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shiftapp.roster_maker import generate_shifts_batch
+
+
+class Command(BaseCommand):
+    help = "Generate rosters for several months at once, solving each month in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int)
+        parser.add_argument('month', type=int)
+        parser.add_argument('--months', type=int, default=3, help="number of months starting from year/month")
+        parser.add_argument('--workers', type=int, default=None, help="process pool size (default: cpu count)")
+        parser.add_argument('--compare-serial', action='store_true', help="also time a serial run and report the speedup")
+        parser.add_argument('--dry-run', action='store_true', help="solve without writing StaffShift rows")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['month'] <= 12:
+            raise CommandError("month must be between 1 and 12")
+        if not 1 <= options['months'] <= 12:
+            raise CommandError("--months must be between 1 and 12")
+
+        report = generate_shifts_batch(
+            options['year'], options['month'],
+            months=options['months'],
+            workers=options['workers'],
+            compare_serial=options['compare_serial'],
+            commit=not options['dry_run'],
+        )
+
+        self.stdout.write(f"months: {', '.join(report['months'])}")
+        self.stdout.write(f"rows: {report['rows']} (uncovered slots: {report['uncovered']})")
+        self.stdout.write(f"parallel: {report['parallel_seconds']}s")
+        if 'serial_seconds' in report:
+            self.stdout.write(f"serial: {report['serial_seconds']}s, speedup x{report['speedup']}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("dry run, nothing written"))
+            return
+
+        for label, conflicts in report['failed'].items():
+            for conflict in conflicts:
+                self.stderr.write(f"{label}: {conflict['shift_date']} staff {conflict['staff']} shift {conflict['shift']}: {conflict['conflict']}")
+        if report['saved']:
+            self.stdout.write(self.style.SUCCESS(f"rosters saved: {', '.join(report['saved'])}"))
+        if report['failed']:
+            raise CommandError(f"roster conflicts, not saved: {', '.join(report['failed'])}")
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from shiftapp.rollups import rebuild_wage_rollups
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a YYYY-MM-DD date")
+
+
+class Command(BaseCommand):
+    help = "Recreate the day / week / month wage rollups from the Wage table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=parse_date, default=None, help="only periods from this date (YYYY-MM-DD)")
+        parser.add_argument('--end-date', type=parse_date, default=None, help="only periods up to this date (YYYY-MM-DD)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start_date, end_date = options['start_date'], options['end_date']
+        if start_date and end_date and start_date > end_date:
+            raise CommandError("--start-date is after --end-date")
+
+        with transaction.atomic():
+            rows = rebuild_wage_rollups(start_date, end_date, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"{rows} rollup rows written"))
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_staffshifts(apps, schema_editor):
+    """
+    generate_shifts used to bulk_create blindly, so running it twice left duplicated rows.
+    Keep one row per (staff, shift_date, shift), preferring the one already paid, and move
+    any wages of the removed rows onto it.
+    """
+    StaffShift = apps.get_model('shiftapp', 'StaffShift')
+    Wage = apps.get_model('shiftapp', 'Wage')
+
+    duplicates = (StaffShift.objects.values('staff', 'shift_date', 'shift')
+                  .annotate(rows=Count('id')).filter(rows__gt=1))
+    for key in duplicates:
+        ids = list(StaffShift.objects.filter(staff=key['staff'], shift_date=key['shift_date'], shift=key['shift'])
+                   .order_by('-has_payslip', 'id').values_list('id', flat=True))
+        keep, extra = ids[0], ids[1:]
+        Wage.objects.filter(shift_id__in=extra).update(shift_id=keep)
+        StaffShift.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0010_delete_timelog'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_staffshifts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='staffshift',
+            constraint=models.UniqueConstraint(fields=('staff', 'shift_date', 'shift'), name='unique_staffshift_staff_date_shift'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0011_staffshift_unique_staffshift_staff_date_shift'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('daily', 'Daily'), ('backfill', 'Backfill'), ('drain', 'Drain')], default='daily', max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('staff_ids', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('last_checkpoint', models.DateField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('undefined_1', models.CharField(blank=True, max_length=200)),
+                ('undefined_2', models.CharField(blank=True, max_length=200)),
+                ('undefined_3', models.CharField(blank=True, max_length=200)),
+                ('undefined_4', models.CharField(blank=True, max_length=200)),
+                ('undefined_5', models.CharField(blank=True, max_length=200)),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:25
+
+from datetime import date
+from decimal import Decimal
+from django.db import migrations, models
+
+# ATO Schedule 1, scale 2 (tax-free threshold claimed), weekly earnings, from 1 July 2024
+SCALE_2_2024 = [
+    ('0', '0', '0'),
+    ('361', '0.1600', '57.8462'),
+    ('500', '0.2600', '107.8462'),
+    ('625', '0.1800', '57.8462'),
+    ('721', '0.1890', '64.3365'),
+    ('865', '0.3227', '180.0385'),
+    ('1282', '0.3200', '176.5769'),
+    ('2596', '0.3900', '358.3077'),
+    ('3653', '0.4700', '650.6154'),
+]
+
+
+def load_tax_brackets(apps, schema_editor):
+    TaxBracket = apps.get_model('shiftapp', 'TaxBracket')
+    TaxBracket.objects.bulk_create([
+        TaxBracket(version='2024-25', effective_from=date(2024, 7, 1), earnings_from=Decimal(earnings_from),
+                   coefficient_a=Decimal(a), coefficient_b=Decimal(b))
+        for earnings_from, a, b in SCALE_2_2024
+    ])
+
+
+def unload_tax_brackets(apps, schema_editor):
+    TaxBracket = apps.get_model('shiftapp', 'TaxBracket')
+    TaxBracket.objects.filter(version='2024-25').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0012_payrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxBracket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=20)),
+                ('effective_from', models.DateField()),
+                ('earnings_from', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('coefficient_a', models.DecimalField(decimal_places=4, max_digits=6)),
+                ('coefficient_b', models.DecimalField(decimal_places=4, max_digits=9)),
+                ('undefined_1', models.CharField(blank=True, max_length=200)),
+                ('undefined_2', models.CharField(blank=True, max_length=200)),
+                ('undefined_3', models.CharField(blank=True, max_length=200)),
+                ('undefined_4', models.CharField(blank=True, max_length=200)),
+                ('undefined_5', models.CharField(blank=True, max_length=200)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('version', 'earnings_from'), name='unique_taxbracket_version_earnings_from')],
+            },
+        ),
+        migrations.RunPython(load_tax_brackets, unload_tax_brackets),
+    ]
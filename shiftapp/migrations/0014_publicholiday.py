@@ -0,0 +1,26 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0013_taxbracket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicHoliday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('holiday_date', models.DateField(unique=True)),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('undefined_1', models.CharField(blank=True, max_length=200)),
+                ('undefined_2', models.CharField(blank=True, max_length=200)),
+                ('undefined_3', models.CharField(blank=True, max_length=200)),
+                ('undefined_4', models.CharField(blank=True, max_length=200)),
+                ('undefined_5', models.CharField(blank=True, max_length=200)),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0014_publicholiday'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='staffshift',
+            index=models.Index(fields=['shift_date', 'id'], name='staffshift_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['start_date', 'id'], name='leaverequest_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wage',
+            index=models.Index(fields=['shift_date', 'id'], name='wage_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0015_staffshift_date_id_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='staffshift',
+            index=models.Index(condition=models.Q(('has_payslip', False)), fields=['shift_date'], name='staffshift_unpaid_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['staff', 'start_date', 'end_date', 'status'], name='leaverequest_staff_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wage',
+            index=models.Index(fields=['staff', 'shift_date'], name='wage_staff_date_idx'),
+        ),
+    ]
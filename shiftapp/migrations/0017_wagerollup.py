@@ -0,0 +1,35 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:10
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0016_staffshift_unpaid_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_type', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('shifts', models.PositiveIntegerField(default=0)),
+                ('hours', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=9)),
+                ('salary', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=12)),
+                ('tax_withheld', models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period_type', 'period_start'], name='wagerollup_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('staff', 'period_type', 'period_start'), name='unique_wagerollup_staff_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:02
+
+from calendar import monthrange
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import migrations
+
+BREAKS = {'none': timedelta(0), '15min': timedelta(minutes=15), '30min': timedelta(minutes=30)}
+HOURS_PLACES = Decimal('0.0001')
+CENT = Decimal('0.01')
+
+
+def work_hours(start_time, end_time, break_min):
+    # Shift.daily_work_hours() as of this migration
+    if not start_time or not end_time:
+        return Decimal('0')
+    worked = datetime.combine(datetime.min, end_time) - datetime.combine(datetime.min, start_time)
+    worked -= BREAKS.get(break_min, timedelta(0))
+    return Decimal(max(worked, timedelta(0)).total_seconds() / 3600).quantize(HOURS_PLACES)
+
+
+def periods(day):
+    monday = day - timedelta(days=day.weekday())
+    yield 'day', day, day
+    yield 'week', monday, monday + timedelta(days=6)
+    yield 'month', day.replace(day=1), day.replace(day=monthrange(day.year, day.month)[1])
+
+
+def backfill_wage_rollups(apps, schema_editor):
+    """
+    Wages written before 0017 have no rollups, and the wage list / summary read the rollups
+    only. Summed here from the historical models so later model changes can't break it.
+    """
+    Wage = apps.get_model('shiftapp', 'Wage')
+    WageRollup = apps.get_model('shiftapp', 'WageRollup')
+
+    totals = defaultdict(lambda: [0, Decimal('0'), Decimal('0'), Decimal('0')])
+    ends = {}
+    wages = Wage.objects.values_list('staff_id', 'shift_date', 'salary', 'tax_withheld', 'shift__shift__start_time',
+                                     'shift__shift__end_time', 'shift__shift__break_min')
+    for staff_id, day, salary, tax_withheld, start_time, end_time, break_min in wages.iterator(chunk_size=5000):
+        hours = work_hours(start_time, end_time, break_min)
+        for period_type, start, end in periods(day):
+            total = totals[(staff_id, period_type, start)]
+            total[0] += 1
+            total[1] += hours
+            total[2] += salary or 0
+            total[3] += tax_withheld or 0
+            ends[(period_type, start)] = end
+
+    WageRollup.objects.all().delete()
+    WageRollup.objects.bulk_create([
+        WageRollup(staff_id=staff_id, period_type=period_type, period_start=start, period_end=ends[(period_type, start)],
+                   shifts=shifts, hours=hours.quantize(CENT), salary=salary.quantize(CENT),
+                   tax_withheld=tax_withheld.quantize(CENT))
+        for (staff_id, period_type, start), (shifts, hours, salary, tax_withheld) in totals.items()
+    ], batch_size=1000)
+
+
+def remove_wage_rollups(apps, schema_editor):
+    apps.get_model('shiftapp', 'WageRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0017_wagerollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_wage_rollups, remove_wage_rollups),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiftapp', '0018_backfill_wagerollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payrun',
+            name='checkpoint_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
 from datetime import timedelta, date, datetime
 
 from django.contrib.auth.models import AbstractUser
@@ -45,6 +45,19 @@ class Members(AbstractUser):
         name = f"{self.first_name} {self.last_name}".strip()
         return name if name else self.email
 
+    def save(self, *args, **kwargs):
+        deactivated = False
+        if not self._state.adding and not self.is_active:
+            was_active = Members.objects.filter(pk=self.pk).values_list('is_active', flat=True).first()
+            deactivated = bool(was_active)
+
+        super().save(*args, **kwargs)
+
+        if deactivated:
+            # status changed: active ➜ inactive, hand their upcoming shifts to someone else
+            from .roster_maker import repair_roster
+            transaction.on_commit(lambda: repair_roster(self.pk).apply())
+
 
 """
 Shift Model is for admin to identify shifts for StaffShift Model to use, for example admin can setup Morning Shift, etc.
@@ -116,6 +129,19 @@ class StaffShift(models.Model):
     undefined_4 = models.CharField(blank=True, max_length=200)
     undefined_5 = models.CharField(blank=True, max_length=200)
 
+    class Meta:
+        constraints = [
+            # one person can't hold the same shift twice on a day, also what makes roster upserts idempotent
+            models.UniqueConstraint(fields=['staff', 'shift_date', 'shift'], name='unique_staffshift_staff_date_shift'),
+        ]
+        indexes = [
+            # keyset pagination order
+            models.Index(fields=['shift_date', 'id'], name='staffshift_date_id_idx'),
+            # (staff, shift_date) lookups are served by the unique constraint's index;
+            # payroll only ever looks for unpaid shifts, which is a small slice of the table
+            models.Index(fields=['shift_date'], condition=models.Q(has_payslip=False), name='staffshift_unpaid_date_idx'),
+        ]
+
     def staff_position(self):
         if self.staff:
             if self.staff.position_type == 'full' and self.staff.is_staff:
@@ -164,6 +190,14 @@ class LeaveRequest(models.Model):
     undefined_4 = models.CharField(blank=True, max_length=200)
     undefined_5 = models.CharField(blank=True, max_length=200)
 
+    class Meta:
+        indexes = [
+            # keyset pagination order
+            models.Index(fields=['start_date', 'id'], name='leaverequest_start_id_idx'),
+            # duplicate request check in LeaveRequestSerializer.validate
+            models.Index(fields=['staff', 'start_date', 'end_date', 'status'], name='leaverequest_staff_period_idx'),
+        ]
+
     def __str__(self):
         return f"{self.staff} - {self.leave_type} ({self.start_date} ~ {self.end_date})"
 
@@ -181,6 +215,11 @@ class LeaveRequest(models.Model):
 
         super().save(*args, **kwargs)
 
+        if not is_new and old.status != 'approved' and self.status == 'approved':
+            # re-roster only the shifts that fall inside the approved leave
+            from .roster_maker import repair_roster
+            transaction.on_commit(lambda: repair_roster(self.staff_id, self.start_date, self.end_date).apply())
+
     def update_leave_balance(self, deduct=True):
         balance, _ = LeaveBalance.objects.get_or_create(staff=self.staff)
         hours = self.leave_hours
@@ -268,5 +307,140 @@ class Wage(models.Model):
     undefined_4 = models.CharField(blank=True, max_length=200)
     undefined_5 = models.CharField(blank=True, max_length=200)
 
+    class Meta:
+        indexes = [
+            # keyset pagination order
+            models.Index(fields=['shift_date', 'id'], name='wage_date_id_idx'),
+            # a staff member's wages over a period
+            models.Index(fields=['staff', 'shift_date'], name='wage_staff_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff} - {self.shift} - {self.salary}"
+
+
+class PublicHoliday(models.Model):
+    holiday_date = models.DateField(unique=True)
+    name = models.CharField(blank=True, max_length=100)
+
+    # reserved fields for potential future expansion
+    undefined_1 = models.CharField(blank=True, max_length=200)
+    undefined_2 = models.CharField(blank=True, max_length=200)
+    undefined_3 = models.CharField(blank=True, max_length=200)
+    undefined_4 = models.CharField(blank=True, max_length=200)
+    undefined_5 = models.CharField(blank=True, max_length=200)
+
+    def __str__(self):
+        return f"{self.holiday_date} {self.name}"
+
+
+class TaxBracket(models.Model):
+    """
+    One row of a PAYG withholding scale (ATO Schedule 1 formula): for weekly earnings x from
+    earnings_from up to the next bracket, weekly withholding = coefficient_a * x - coefficient_b.
+    Rows sharing a version form one table, used for pay periods from effective_from on.
+    """
+    version = models.CharField(max_length=20)
+    effective_from = models.DateField()
+    earnings_from = models.DecimalField(decimal_places=2, max_digits=9)
+    coefficient_a = models.DecimalField(decimal_places=4, max_digits=6)
+    coefficient_b = models.DecimalField(decimal_places=4, max_digits=9)
+
+    # reserved fields for potential future expansion
+    undefined_1 = models.CharField(blank=True, max_length=200)
+    undefined_2 = models.CharField(blank=True, max_length=200)
+    undefined_3 = models.CharField(blank=True, max_length=200)
+    undefined_4 = models.CharField(blank=True, max_length=200)
+    undefined_5 = models.CharField(blank=True, max_length=200)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['version', 'earnings_from'], name='unique_taxbracket_version_earnings_from'),
+        ]
+
+    def __str__(self):
+        return f"{self.version} from ${self.earnings_from}: {self.coefficient_a}x - {self.coefficient_b}"
+
+
+class PayRun(models.Model):
+    """
+    Ledger of payroll runs. Days up to and including last_checkpoint are fully paid, so a
+    failed run resumes from the day after it instead of starting over. A 'running' run whose
+    checkpoint_at (or started_at) is older than PAY_RUN_STALE_MINUTES lost its worker and is
+    resumed the same way.
+    """
+    KIND_CHOICES = [
+        ('daily', 'Daily'),
+        ('backfill', 'Backfill'),
+        ('drain', 'Drain'),
+    ]
+
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(choices=KIND_CHOICES, default='daily', max_length=20)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # null means everyone, otherwise the ids of the staff this run pays
+    staff_ids = models.JSONField(null=True, blank=True)
+    status = models.CharField(choices=STATUS_CHOICES, default='running', max_length=10)
+    rows_processed = models.PositiveIntegerField(default=0)
+    last_checkpoint = models.DateField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    # last time the run made progress (a batch or a day), the heartbeat stale runs are found by
+    checkpoint_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # reserved fields for potential future expansion
+    undefined_1 = models.CharField(blank=True, max_length=200)
+    undefined_2 = models.CharField(blank=True, max_length=200)
+    undefined_3 = models.CharField(blank=True, max_length=200)
+    undefined_4 = models.CharField(blank=True, max_length=200)
+    undefined_5 = models.CharField(blank=True, max_length=200)
+
+    def next_day(self):
+        if self.last_checkpoint:
+            return self.last_checkpoint + timedelta(days=1)
+        return self.start_date
+
+    def __str__(self):
+        return f"{self.kind} pay run {self.start_date} ~ {self.end_date} - {self.status} ({self.rows_processed} rows)"
+
+
+class WageRollup(models.Model):
+    """
+    Wage totals of one staff member over one period, kept in step with Wage by
+    shiftapp.rollups so summaries read a few rows instead of the whole ledger.
+    Derived data only: rebuild_wage_rollups recreates it from Wage at any time.
+    """
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),  # same Monday ~ Sunday week as the pay period
+        ('month', 'Month'),
+    ]
+
+    staff = models.ForeignKey(Members, on_delete=models.CASCADE)
+    period_type = models.CharField(choices=PERIOD_CHOICES, max_length=10)
+    period_start = models.DateField()
+    period_end = models.DateField()
+    shifts = models.PositiveIntegerField(default=0)
+    hours = models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=9)
+    salary = models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=12)
+    tax_withheld = models.DecimalField(decimal_places=2, default=Decimal('0.0'), max_digits=12)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['staff', 'period_type', 'period_start'], name='unique_wagerollup_staff_period'),
+        ]
+        indexes = [
+            # everyone's totals for a range of periods
+            models.Index(fields=['period_type', 'period_start'], name='wagerollup_period_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.staff} - {self.shift} - {self.salary}"
\ No newline at end of file
+        return f"{self.staff} - {self.period_type} {self.period_start} ~ {self.period_end} - {self.salary}"
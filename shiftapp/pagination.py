@@ -0,0 +1,107 @@
+import base64
+from datetime import date
+from urllib import parse
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class DateKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination ordered by (date_field, id).
+
+    The cursor is the (date, id) of the last row seen, so every page is a
+    WHERE (date, id) > (d, i) ORDER BY date, id LIMIT n range scan on the matching index and
+    page 100 costs the same as page 1. Rows without a date can't be placed and are left out.
+    """
+    date_field = 'shift_date'
+    page_size = 100
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            querystring = base64.b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring)
+            return date.fromisoformat(tokens['d'][0]), int(tokens['i'][0]), tokens.get('r', ['0'])[0] == '1'
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Invalid cursor')
+
+    def row_key(self, row):
+        # model instances, or dicts from a .values() queryset
+        if isinstance(row, dict):
+            return row[self.date_field], row['id']
+        return getattr(row, self.date_field), row.pk
+
+    def encode_cursor(self, row, reverse):
+        day, pk = self.row_key(row)
+        querystring = parse.urlencode({'d': day.isoformat(), 'i': pk,
+                                       'r': '1' if reverse else '0'})
+        encoded = base64.b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        field = self.date_field
+
+        queryset = queryset.exclude(**{f'{field}__isnull': True})
+        reverse = False
+        if cursor is None:
+            queryset = queryset.order_by(field, 'id')
+        else:
+            day, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(Q(**{f'{field}__lt': day}) | Q(**{field: day, 'id__lt': pk}))
+                queryset = queryset.order_by(f'-{field}', '-id')
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__gt': day}) | Q(**{field: day, 'id__gt': pk}))
+                queryset = queryset.order_by(field, 'id')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class LeaveRequestPagination(DateKeysetPagination):
+    date_field = 'start_date'
@@ -0,0 +1,335 @@
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import timedelta
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, CharField, DecimalField, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Coalesce, Round
+
+from django.utils import timezone
+
+from .models import Members, PayRun, PublicHoliday, StaffShift, Wage
+from .shift_registry import shift_registry
+from .tax import pay_week
+
+CASUAL_LOADING = Decimal('1.25')
+# every PAYROLL_MODES entry pays the same hours and rounds the same way as the SQL Round()
+HOURS_PLACES = Decimal('0.0001')
+CENT = Decimal('0.01')
+
+# Wage columns filled by the set-based insert, in INSERT order
+WAGE_INSERT_FIELDS = ['staff', 'shift', 'shift_date', 'tax_withheld', 'salary',
+                      'undefined_1', 'undefined_2', 'undefined_3', 'undefined_4', 'undefined_5']
+
+
+def payable_shifts(shifts):
+    # a cover shift without an alternative has nobody to pay
+    return shifts.exclude(cover_shift=True, alternative_staff__isnull=True)
+
+
+def template_hours(shift_id):
+    return shift_registry.get(shift_id).work_hours.quantize(HOURS_PLACES)
+
+
+def round_salary(salary):
+    # half away from zero, like ROUND() in SQL, not the half-even of Decimal.quantize()
+    return salary.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def shift_hours_expression(field='shift_id'):
+    """
+    Work hours of a StaffShift's template as a SQL CASE over the (few) templates in the
+    shift registry, so the database can compute salary without joining Shift.
+    """
+    whens = [When(**{field: template.id}, then=Value(template.work_hours.quantize(HOURS_PLACES)))
+             for template in shift_registry.all()]
+    return Case(*whens, default=Value(Decimal('0')), output_field=DecimalField(max_digits=9, decimal_places=4))
+
+
+def worker_expression(field):
+    """
+    The person who actually worked: alternative_staff for a cover shift, otherwise staff.
+    """
+    return Case(When(cover_shift=True, then=F(f'alternative_staff__{field}')), default=F(f'staff__{field}'))
+
+
+def salary_expression():
+    loading = Case(
+        When(cover_shift=True, alternative_staff__position_type='casual', then=Value(CASUAL_LOADING)),
+        When(cover_shift=False, staff__position_type='casual', then=Value(CASUAL_LOADING)),
+        default=Value(Decimal('1')),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+    salary = ExpressionWrapper(shift_hours_expression() * worker_expression('pay_rate') * loading,
+                               output_field=DecimalField(max_digits=12, decimal_places=4))
+    return Round(salary, 2, output_field=DecimalField(max_digits=5, decimal_places=2))
+
+
+def pay_shifts_set_based(shifts):
+    """
+    Create the Wage rows of every shift in one INSERT ... SELECT, salary computed in SQL from
+    the worker's pay_rate, casual loading and the template hours.
+    """
+    # every selected column is an annotation so the SELECT keeps exactly this order
+    select = payable_shifts(shifts).annotate(**{
+        'wage_staff': Case(When(cover_shift=True, then=F('alternative_staff_id')), default=F('staff_id')),
+        'wage_shift': F('id'),
+        'wage_shift_date': F('shift_date'),
+        'wage_tax_withheld': Value(Decimal('0'), output_field=DecimalField(max_digits=5, decimal_places=2)),
+        'wage_salary': salary_expression(),
+        **{f'wage_{name}': Value('', output_field=CharField()) for name in WAGE_INSERT_FIELDS[5:]},
+    }).values_list(*[f'wage_{name}' for name in WAGE_INSERT_FIELDS])
+
+    sql, params = select.query.sql_with_params()
+    columns = ', '.join(connection.ops.quote_name(Wage._meta.get_field(name).column) for name in WAGE_INSERT_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {connection.ops.quote_name(Wage._meta.db_table)} ({columns}) {sql}", params)
+        return cursor.rowcount
+
+
+def pay_shifts_python(shifts):
+    """
+    Row by row version of the same calculation, kept for comparison and debugging.
+    """
+    wages = []
+    for s in payable_shifts(shifts).select_related('staff', 'alternative_staff'):
+        employee = s.staff if not s.cover_shift else s.alternative_staff
+        work_hours = template_hours(s.shift_id)
+        pay_rate = employee.pay_rate
+        if employee.position_type == 'casual':
+            pay_rate = employee.pay_rate * CASUAL_LOADING
+        wages.append(Wage(staff=employee, shift=s, salary=round_salary(work_hours * pay_rate), shift_date=s.shift_date))
+    Wage.objects.bulk_create(wages)
+    return len(wages)
+
+
+def day_multiplier(day, holidays, multipliers):
+    if day in holidays:
+        return multipliers['holiday']
+    if day.weekday() == 5:
+        return multipliers['saturday']
+    if day.weekday() == 6:
+        return multipliers['sunday']
+    return multipliers['weekday']
+
+
+def split_overtime(hours_before, hours, threshold, tiers):
+    """
+    Split a shift's hours into [(hours, overtime multiplier or None for ordinary time)], given
+    the hours already worked earlier in the pay week.
+    tiers: [(tier length in hours or None for unlimited, multiplier), ...] above the threshold.
+    """
+    parts = []
+    ordinary = max(min(hours, threshold - hours_before), Decimal('0'))
+    if ordinary:
+        parts.append((ordinary, None))
+    remaining = hours - ordinary
+    worked_over = max(hours_before - threshold, Decimal('0'))
+    for length, multiplier in tiers:
+        if remaining <= 0:
+            break
+        if length is None:
+            parts.append((remaining, multiplier))
+            remaining = Decimal('0')
+            break
+        room = max(length - worked_over, Decimal('0'))
+        worked_over = max(worked_over - length, Decimal('0'))
+        take = min(room, remaining)
+        if take:
+            parts.append((take, multiplier))
+            remaining -= take
+    return parts
+
+
+def pay_shifts_with_rates(shifts):
+    """
+    Penalty rates and weekly overtime. Every shift of the same people in the same pay weeks
+    (paid or not) is loaded in one query, so overtime counts hours worked earlier in the week;
+    only the shifts in `shifts` get Wage rows.
+    """
+    multipliers = {key: Decimal(str(value)) for key, value in settings.PAY_RATE_MULTIPLIERS.items()}
+    threshold = Decimal(str(settings.OVERTIME_THRESHOLD_HOURS))
+    tiers = [(Decimal(str(length)) if length is not None else None, Decimal(str(multiplier)))
+             for length, multiplier in settings.OVERTIME_TIERS]
+
+    worker = Case(When(cover_shift=True, then=F('alternative_staff_id')), default=F('staff_id'))
+    claimed = {row['id']: row for row in payable_shifts(shifts).annotate(worker=worker)
+               .values('id', 'worker', 'shift_date', 'shift_id')}
+    if not claimed:
+        return 0
+
+    workers = {row['worker'] for row in claimed.values()}
+    first_day = pay_week(min(row['shift_date'] for row in claimed.values()))[0]
+    last_day = pay_week(max(row['shift_date'] for row in claimed.values()))[1]
+
+    week_rows = payable_shifts(StaffShift.objects.filter(shift_date__range=(first_day, last_day))).annotate(
+        worker=worker).filter(worker__in=workers).values('id', 'worker', 'shift_date', 'shift_id')
+    members = {member['id']: member for member in
+               Members.objects.filter(id__in=workers).values('id', 'pay_rate', 'position_type')}
+    holidays = set(PublicHoliday.objects.filter(holiday_date__range=(first_day, last_day))
+                   .values_list('holiday_date', flat=True))
+
+    by_week = defaultdict(list)
+    for row in week_rows:
+        by_week[(row['worker'], pay_week(row['shift_date'])[0])].append(row)
+
+    wages = []
+    for (worker_id, _), rows in by_week.items():
+        member = members[worker_id]
+        base_rate = member['pay_rate'] * (CASUAL_LOADING if member['position_type'] == 'casual' else 1)
+        rows.sort(key=lambda row: (row['shift_date'], shift_registry.get(row['shift_id']).start_time, row['id']))
+
+        hours_before = Decimal('0')
+        for row in rows:
+            hours = template_hours(row['shift_id'])
+            if row['id'] in claimed:
+                multiplier = day_multiplier(row['shift_date'], holidays, multipliers)
+                salary = sum((part_hours * base_rate * (max(multiplier, overtime) if overtime else multiplier)
+                              for part_hours, overtime in split_overtime(hours_before, hours, threshold, tiers)),
+                             Decimal('0'))
+                wages.append(Wage(staff_id=worker_id, shift_id=row['id'], shift_date=row['shift_date'],
+                                  salary=round_salary(salary)))
+            hours_before += hours
+
+    Wage.objects.bulk_create(wages)
+    return len(wages)
+
+
+PAYROLL_MODES = {
+    'set': pay_shifts_set_based,
+    'python': pay_shifts_python,
+    'rates': pay_shifts_with_rates,
+}
+
+
+def claim_unpaid_shifts(shifts, batch_size):
+    """
+    Lock up to batch_size unpaid shifts that no other worker is holding and return their ids.
+    Must run inside transaction.atomic(); the locks are held until that transaction ends.
+
+    On PostgreSQL this is SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers each get a
+    disjoint batch. SQLite has no row locks and ignores select_for_update; there the
+    'IMMEDIATE' transaction mode in settings makes every claim take the database write lock,
+    which serialises the workers instead.
+    """
+    return list(payable_shifts(shifts.filter(has_payslip=False))
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size])
+
+
+def pay_shifts(shifts, mode=None, batch_size=None, pay_run=None):
+    """
+    Create Wage rows for the unpaid shifts in `shifts` and mark them paid. Work is claimed in
+    batches; each batch's Wage rows and has_payslip update commit together, so any number of
+    workers can pay overlapping ranges without creating a Wage twice.
+    Returns the number of Wage rows created; with pay_run, its rows_processed is bumped in the
+    same transaction as each batch.
+    """
+    mode = mode or settings.PAYROLL_MODE
+    batch_size = batch_size or settings.PAYROLL_BATCH_SIZE
+    created = 0
+    while True:
+        with transaction.atomic():
+            ids = claim_unpaid_shifts(shifts, batch_size)
+            if not ids:
+                break
+            claimed = StaffShift.objects.filter(id__in=ids)
+            rows = PAYROLL_MODES[mode](claimed)
+            claimed.update(has_payslip=True)
+            from .rollups import wages_written
+            wages_written(Wage.objects.filter(shift_id__in=ids).values_list('staff_id', 'shift_date'))
+            if pay_run:
+                PayRun.objects.filter(pk=pay_run.pk).update(rows_processed=F('rows_processed') + rows,
+                                                            checkpoint_at=timezone.now())
+            created += rows
+    return created
+
+
+def unpaid_shifts_on(day):
+    return StaffShift.objects.filter(shift_date=day, has_payslip=False)
+
+
+def unpaid_shifts_between(start_date, end_date, staff_ids=None):
+    shifts = StaffShift.objects.filter(shift_date__range=(start_date, end_date), has_payslip=False)
+    if staff_ids is not None:
+        # staff_ids are the people who worked, i.e. who the Wage row goes to
+        shifts = shifts.filter(Q(cover_shift=False, staff_id__in=staff_ids) |
+                               Q(cover_shift=True, alternative_staff_id__in=staff_ids))
+    return shifts
+
+
+def payroll_chunks(start_date, end_date, by='day', staff_chunk_size=50):
+    """
+    Split a date range into chunks that never share a StaffShift, so they can be paid
+    concurrently: one chunk per day, or the whole range for a group of staff.
+    Yields (start_date, end_date, staff_ids).
+    """
+    if by == 'day':
+        day = start_date
+        while day <= end_date:
+            yield day, day, None
+            day += timedelta(days=1)
+    elif by == 'staff':
+        workers = unpaid_shifts_between(start_date, end_date).annotate(
+            worker=Case(When(cover_shift=True, then=F('alternative_staff_id')), default=F('staff_id')),
+        ).values_list('worker', flat=True).distinct().order_by('worker')
+        workers = [worker for worker in workers if worker]
+        for i in range(0, len(workers), staff_chunk_size):
+            yield start_date, end_date, workers[i:i + staff_chunk_size]
+    else:
+        raise ValueError(f"unknown chunk type '{by}', choose 'day' or 'staff'")
+
+
+def run_payroll(start_date, end_date, kind='daily', staff_ids=None, mode=None, pay_run=None):
+    """
+    Pay start_date ~ end_date day by day, recording the run in a PayRun. After each day the
+    checkpoint moves forward; pass an existing (failed) pay_run to carry on from its checkpoint.
+    Each batch is committed together with its has_payslip flags, so re-doing a half finished
+    day only picks up what is still unpaid.
+    """
+    if pay_run is None:
+        pay_run = PayRun.objects.create(kind=kind, start_date=start_date, end_date=end_date, staff_ids=staff_ids)
+    else:
+        PayRun.objects.filter(pk=pay_run.pk).update(status='running', error='', finished_at=None,
+                                                    checkpoint_at=timezone.now())
+
+    day = pay_run.next_day()
+    try:
+        while day <= pay_run.end_date:
+            pay_shifts(unpaid_shifts_between(day, day, pay_run.staff_ids), mode=mode, pay_run=pay_run)
+            PayRun.objects.filter(pk=pay_run.pk).update(last_checkpoint=day, checkpoint_at=timezone.now())
+            day += timedelta(days=1)
+    except Exception as e:
+        PayRun.objects.filter(pk=pay_run.pk).update(status='failed', error=repr(e), finished_at=timezone.now())
+        raise
+
+    PayRun.objects.filter(pk=pay_run.pk).update(status='succeeded', finished_at=timezone.now())
+    pay_run.refresh_from_db()
+    return pay_run
+
+
+def resumable_pay_runs():
+    """
+    Failed runs, and 'running' runs that made no progress for PAY_RUN_STALE_MINUTES: their
+    worker was killed (OOM, SIGKILL, a deploy) before it could mark them failed.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.PAY_RUN_STALE_MINUTES)
+    return (PayRun.objects.annotate(heartbeat=Coalesce('checkpoint_at', 'started_at'))
+            .filter(Q(status='failed') | Q(status='running', heartbeat__lt=cutoff))
+            .order_by('id'))
+
+
+def claim_pay_run(pay_run):
+    """
+    Take over a run found by resumable_pay_runs(), unless another worker did in the meantime.
+    """
+    return PayRun.objects.filter(pk=pay_run.pk, status=pay_run.status, checkpoint_at=pay_run.checkpoint_at).update(
+        status='running', checkpoint_at=timezone.now()) == 1
+
+
+def resume_pay_run(pay_run_id, mode=None):
+    pay_run = PayRun.objects.get(pk=pay_run_id)
+    if pay_run.status == 'succeeded':
+        return pay_run
+    return run_payroll(pay_run.start_date, pay_run.end_date, mode=mode, pay_run=pay_run)
@@ -0,0 +1,111 @@
+import os
+import csv
+import html
+from pathlib import Path
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.conf import settings
+
+from .models import Wage
+from .shift_registry import shift_registry
+from .utils import can_use_process_pool
+
+PAYSLIP_FORMATS = ['html', 'csv']
+
+
+def payslip_path(period_start, period_end, staff_id, fmt):
+    return Path(settings.PAYSLIP_ROOT) / f"{period_start}_{period_end}" / f"{staff_id}.{fmt}"
+
+
+def staff_payslip_jobs(period_start, period_end):
+    """
+    One ordered query over the period's wages, streamed with iterator() and cut into one job
+    per staff member, so memory only ever holds a single person's rows.
+    """
+    rows = (Wage.objects.filter(shift_date__range=(period_start, period_end))
+            .order_by('staff_id', 'shift_date', 'id')
+            .values_list('staff_id', 'staff__first_name', 'staff__last_name', 'staff__email',
+                         'shift_date', 'shift__shift_id', 'salary', 'tax_withheld')
+            .iterator(chunk_size=2000))
+
+    for staff_id, staff_rows in groupby(rows, key=itemgetter(0)):
+        lines = []
+        name = ''
+        for _, first_name, last_name, email, shift_date, shift_id, salary, tax_withheld in staff_rows:
+            name = f"{first_name} {last_name}".strip() or email
+            template = shift_registry.get(shift_id)
+            lines.append((shift_date.isoformat(), template.display if template else '',
+                          str(round(template.work_hours, 2)) if template else '0',
+                          str(salary), str(tax_withheld)))
+        yield {
+            'staff_id': staff_id,
+            'name': name,
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat(),
+            'lines': lines,
+            'html_path': str(payslip_path(period_start, period_end, staff_id, 'html')),
+            'csv_path': str(payslip_path(period_start, period_end, staff_id, 'csv')),
+        }
+
+
+def render_payslip(job):
+    """
+    Worker side: plain data in, two files out. No ORM access, so it runs in any process.
+    """
+    gross = sum((Decimal(line[3]) for line in job['lines']), Decimal('0'))
+    tax = sum((Decimal(line[4]) for line in job['lines']), Decimal('0'))
+
+    csv_path = Path(job['csv_path'])
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['shift_date', 'shift', 'hours', 'salary', 'tax_withheld'])
+        writer.writerows(job['lines'])
+        writer.writerow(['total', '', '', str(gross), str(tax)])
+
+    rows = ''.join(
+        '<tr>' + ''.join(f'<td>{html.escape(value)}</td>' for value in line) + '</tr>'
+        for line in job['lines']
+    )
+    page = (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f'<title>Payslip {html.escape(job["name"])} {job["period_start"]} ~ {job["period_end"]}</title>'
+        '<style>body{font-family:sans-serif}table{border-collapse:collapse}'
+        'td,th{border:1px solid #ccc;padding:4px 8px;text-align:left}</style></head><body>'
+        f'<h1>Payslip</h1><p>{html.escape(job["name"])}<br>'
+        f'Pay period: {job["period_start"]} ~ {job["period_end"]}</p>'
+        '<table><tr><th>Date</th><th>Shift</th><th>Hours</th><th>Salary</th><th>Tax withheld</th></tr>'
+        f'{rows}</table>'
+        f'<p>Gross: ${gross}<br>Tax withheld: ${tax}<br>Net: ${gross - tax}</p>'
+        '</body></html>'
+    )
+    Path(job['html_path']).write_text(page, encoding='utf-8')
+    return job['staff_id']
+
+
+def generate_payslips(period_start, period_end, workers=None):
+    """
+    Render every payslip of the pay period into PAYSLIP_ROOT. Jobs are handed to a process
+    pool as the query streams, with a bounded number in flight, so memory stays flat however
+    many staff there are. Returns the number of payslips written.
+    """
+    jobs = staff_payslip_jobs(period_start, period_end)
+
+    if not can_use_process_pool(workers):
+        return sum(1 for job in jobs if render_payslip(job) is not None)
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * 4
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for job in jobs:
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written += sum(1 for future in done if future.result() is not None)
+            pending.add(pool.submit(render_payslip, job))
+        written += sum(1 for future in pending if future.result() is not None)
+    return written
@@ -0,0 +1,79 @@
+"""
+Read-only fast path for the list endpoints: rows come straight from .values() with names
+built in SQL, and are turned into the same dicts StaffShiftSerializer / WageSerializer
+return, without creating model instances or serializer fields per row.
+"""
+from decimal import Decimal
+
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+
+from .shift_registry import shift_registry
+
+CENT = Decimal('0.01')
+
+
+def member_name(prefix):
+    """
+    str(Members) in SQL: "first last", or the email when both are blank.
+    """
+    full_name = Trim(Concat(F(f'{prefix}first_name'), Value(' '), F(f'{prefix}last_name'), output_field=CharField()))
+    return Coalesce(NullIf(full_name, Value('')), F(f'{prefix}email'), output_field=CharField())
+
+
+def staffshift_values(queryset):
+    return queryset.values(
+        'id', 'shift_date', 'staff_id', 'shift_id', 'cover_shift', 'alternative_staff_id',
+        staff_name=member_name('staff__'),
+        alternative_staff_name=member_name('alternative_staff__'),
+    )
+
+
+def staffshift_rows(rows):
+    """
+    Same output as StaffShiftSerializer(rows, many=True).data for rows of staffshift_values().
+    """
+    labels = {template.id: template.display for template in shift_registry.all()}
+    data = []
+    for row in rows:
+        rep = {
+            'id': row['id'],
+            'shift_date': row['shift_date'].isoformat(),
+            'staff': row['staff_id'],
+            'staff_name': row['staff_name'],
+            'shift': row['shift_id'],
+            'shift_name': labels.get(row['shift_id']),
+        }
+        if row['cover_shift']:
+            rep['cover_shift'] = True
+            rep['alternative_staff'] = row['alternative_staff_id']
+            # str(None), as the serializer shows a cover shift without alternative
+            rep['alternative_staff_name'] = str(row['alternative_staff_name'])
+        data.append(rep)
+    return data
+
+
+def wage_values(queryset):
+    return queryset.values(
+        'id', 'shift_date', 'pay_date', 'salary', 'shift__shift_date', 'shift__shift_id',
+        staff_name=member_name('staff__'),
+    )
+
+
+def wage_rows(rows):
+    """
+    Same output as WageSerializer(rows, many=True).data for rows of wage_values().
+    """
+    labels = {template.id: template.display for template in shift_registry.all()}
+    data = []
+    for row in rows:
+        rep = {
+            'id': row['id'],
+            'staff': row['staff_name'],
+            'shift': f"shift_date: {row['shift__shift_date']} - {labels.get(row['shift__shift_id'])}",
+        }
+        if row['pay_date']:
+            rep['pay_date'] = row['pay_date'].isoformat()
+        rep['salary'] = '{:f}'.format(Decimal(row['salary']).quantize(CENT))
+        data.append(rep)
+    return data
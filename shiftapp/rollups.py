@@ -0,0 +1,122 @@
+from calendar import monthrange
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from .caching import invalidate_wage_date_range
+from .models import Wage, WageRollup
+from .payroll import shift_hours_expression
+from .tax import pay_week
+
+ROLLUP_PERIODS = ['day', 'week', 'month']
+ROLLUP_UNIQUE_FIELDS = ['staff', 'period_type', 'period_start']
+ROLLUP_UPDATE_FIELDS = ['period_end', 'shifts', 'hours', 'salary', 'tax_withheld', 'updated_at']
+CENT = Decimal('0.01')
+
+
+def period_bounds(period_type, day):
+    """
+    (first, last) day of the period that `day` falls in.
+    """
+    if period_type == 'day':
+        return day, day
+    if period_type == 'week':
+        return pay_week(day)
+    if period_type == 'month':
+        return day.replace(day=1), day.replace(day=monthrange(day.year, day.month)[1])
+    raise ValueError(f"unknown period '{period_type}', choose from {ROLLUP_PERIODS}")
+
+
+def refresh_wage_rollups(keys, batch_size=1000):
+    """
+    Recompute the day, week and month rollups touched by `keys`, an iterable of
+    (staff_id, shift_date) pairs of Wage rows that were written or deleted.
+
+    Each touched period is re-summed from Wage with one grouped query for all of its staff, so
+    the result is the same however the rows changed; periods left without wages are deleted.
+    Returns the number of rollup rows written.
+    """
+    periods = defaultdict(set)
+    for staff_id, day in keys:
+        if staff_id is None or day is None:
+            continue
+        for period_type in ROLLUP_PERIODS:
+            periods[(period_type, *period_bounds(period_type, day))].add(staff_id)
+
+    rollups = []
+    for (period_type, start, end), staff_ids in periods.items():
+        totals = (Wage.objects.filter(staff_id__in=staff_ids, shift_date__range=(start, end))
+                  .values('staff_id').order_by()
+                  .annotate(shifts=Count('id'),
+                            hours=Sum(shift_hours_expression('shift__shift_id')),
+                            salary=Sum('salary'),
+                            tax_withheld=Sum('tax_withheld')))
+        found = set()
+        for total in totals:
+            found.add(total['staff_id'])
+            rollups.append(WageRollup(
+                staff_id=total['staff_id'],
+                period_type=period_type,
+                period_start=start,
+                period_end=end,
+                shifts=total['shifts'],
+                hours=Decimal(total['hours'] or 0).quantize(CENT),
+                salary=Decimal(total['salary'] or 0).quantize(CENT),
+                tax_withheld=Decimal(total['tax_withheld'] or 0).quantize(CENT),
+            ))
+
+        # staff left without wages in the period: all of them were deleted
+        if staff_ids - found:
+            WageRollup.objects.filter(staff_id__in=staff_ids - found, period_type=period_type, period_start=start).delete()
+
+    WageRollup.objects.bulk_create(
+        rollups,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=ROLLUP_UNIQUE_FIELDS,
+        update_fields=ROLLUP_UPDATE_FIELDS,
+    )
+    return len(rollups)
+
+
+def wages_written(keys, batch_size=1000):
+    """
+    What the Wage signals do, for writes that skip them (bulk_create, bulk_update, update()):
+    keys are the (staff_id, shift_date) pairs written. Call it inside the write's transaction.
+    """
+    invalidate_wage_date_range()
+    return refresh_wage_rollups(keys, batch_size=batch_size)
+
+
+def rebuild_wage_rollups(start_date=None, end_date=None, batch_size=1000):
+    """
+    Recreate the rollups from Wage, for everything or for the periods overlapping
+    start_date ~ end_date. The range is widened to whole weeks and months first, so a
+    partly covered period is rebuilt from all of its wages. Returns the rows written.
+    """
+    rollups = WageRollup.objects.all()
+    wages = Wage.objects.all()
+    if start_date:
+        start_date = min(pay_week(start_date)[0], start_date.replace(day=1))
+        rollups = rollups.filter(period_end__gte=start_date)
+        wages = wages.filter(shift_date__gte=start_date)
+    if end_date:
+        end_date = max(pay_week(end_date)[1], period_bounds('month', end_date)[1])
+        rollups = rollups.filter(period_start__lte=end_date)
+        wages = wages.filter(shift_date__lte=end_date)
+
+    rollups.delete()
+    keys = wages.values_list('staff_id', 'shift_date').distinct().order_by()
+    return refresh_wage_rollups(keys.iterator(chunk_size=5000), batch_size=batch_size)
+
+
+def rollup_totals(start_date, end_date, staff_ids=None):
+    """
+    Shift count and salary of start_date ~ end_date summed from the daily rollups.
+    """
+    rollups = WageRollup.objects.filter(period_type='day', period_start__range=(start_date, end_date))
+    if staff_ids is not None:
+        rollups = rollups.filter(staff_id__in=staff_ids)
+    return rollups.aggregate(shifts=Sum('shifts'), hours=Sum('hours'), salary=Sum('salary'),
+                             tax_withheld=Sum('tax_withheld'))
@@ -0,0 +1,78 @@
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .caching import bump_versions
+from .events import roster_months_event
+from .utils import as_date
+
+# see CACHES in settings, a cache directory of its own so roster pages don't push out anything else
+ROSTER_CACHE_ALIAS = 'roster'
+MONTH_GENERATION_KEY = 'shiftapp:roster:{}-{:02d}'
+
+
+def roster_cache():
+    return caches[ROSTER_CACHE_ALIAS]
+
+
+def month_generation(year, month):
+    """
+    Every cached response of a month is stored under the month's current generation, so
+    evicting the month is a single delete and a response built from rows read before the
+    eviction can only ever land under the old, unreachable generation.
+    """
+    cache = roster_cache()
+    key = MONTH_GENERATION_KEY.format(year, month)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, None):
+            generation = cache.get(key) or generation
+    return generation
+
+
+def cached_month_response(year, month, scope, variant, build):
+    """
+    Response data of one roster read of year/month, built by build() on a miss.
+    scope is who the rows are for ('all', or 'staff:<id>'), variant tells apart the requests
+    of the same month and scope (query string, page).
+    """
+    variant = hashlib.md5(variant.encode()).hexdigest()
+    key = f"{MONTH_GENERATION_KEY.format(year, month)}:{month_generation(year, month)}:{scope}:{variant}"
+    cache = roster_cache()
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data)
+    return data
+
+
+def evict_months(months):
+    """
+    Drop the cached responses of the given (year, month) pairs: right away, and again on
+    commit, so a read between the two can't keep the rows from before the write.
+    """
+    keys = [MONTH_GENERATION_KEY.format(year, month) for year, month in set(months)]
+    if not keys:
+        return
+    roster_cache().delete_many(keys)
+    transaction.on_commit(lambda: roster_cache().delete_many(keys))
+
+
+def months_of(days):
+    days = [as_date(day) for day in days if day]
+    return {(day.year, day.month) for day in days}
+
+
+def staffshifts_written(days):
+    """
+    What the StaffShift signals do, for writes that skip them (bulk_create, bulk_update):
+    days are the shift dates written, old and new. Bumps the ETag version, evicts the cached
+    months and tells the open event streams to reload them.
+    """
+    bump_versions('staffshift')
+    months = months_of(days)
+    evict_months(months)
+    roster_months_event(months)
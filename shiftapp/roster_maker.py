@@ -1,7 +1,19 @@
 from datetime import date, timedelta
 from collections import defaultdict
+import time
 import random
+import logging as log
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from .models import *
+from .conflicts import ConflictIndex, RosterConflictError, roster_conflicts, worker_of
+from .roster_cache import staffshifts_written
+from .leave_index import LeaveIndex
+from .utils import as_date, can_use_process_pool
+from .shift_registry import shift_registry
+from .roster_solver import RosterSolver, Slot, solve_month
 
 import calendar
 from datetime import date
@@ -73,74 +85,512 @@ def generate_monthly_weeks(year: int, month: int):
 
     return cleaned_weeks
 
-def casual_weekly_schedule(week_list, casual_list):
-    after = Shift.objects.filter(shift_name='Afternoon Shift').first()
+def casual_weekly_schedule(week_list, casual_list, leave_index=None):
+    after = shift_registry.by_name('Afternoon Shift')
     # weekend shifts
-    weekend_morning = Shift.objects.filter(shift_name='Weekend Morning').first()
-    weekend_mid = Shift.objects.filter(shift_name='Weekend Midday').first()
+    weekend_morning = shift_registry.by_name('Weekend Morning')
+    weekend_mid = shift_registry.by_name('Weekend Midday')
     # saturdays only
-    helper_a = list(Shift.objects.filter(shift_name='Weekend Helper A'))
-    helper_b = list(Shift.objects.filter(shift_name='Weekend Helper B'))
+    helper_a = shift_registry.all_by_name('Weekend Helper A')
+    helper_b = shift_registry.all_by_name('Weekend Helper B')
     staffshifts = []
 
+    def on_leave(staff, day):
+        return leave_index is not None and leave_index.is_on_leave(staff.id, date.fromisoformat(day))
+
     for _, week in enumerate(week_list, start=1):
         schedule = defaultdict(list)
         person_shift_counts = {staff: 0 for staff in casual_list}
 
         for day in week.get("weekdays", []):
-            available = [staff for staff in casual_list if person_shift_counts[staff] < 4]
+            available = [staff for staff in casual_list if person_shift_counts[staff] < 4
+                         and not on_leave(staff, day)]
             if not available:
                 continue
             staff = random.choice(available)
-            staffshifts.append(StaffShift(shift_date=day, staff=staff, shift=after))
+            staffshifts.append(StaffShift(shift_date=day, staff=staff, shift_id=after.id))
             person_shift_counts[staff] += 1
 
         for day in week.get("saturdays", []):
-            available = [staff for staff in casual_list if person_shift_counts[staff] < 4 and day not in schedule[staff]]
+            available = [staff for staff in casual_list if person_shift_counts[staff] < 4 and day not in schedule[staff]
+                         and not on_leave(staff, day)]
             random.shuffle(available)
             sequence_number = 0
             helper = random.choice(helper_a + helper_b)
             shift_mape = {1: weekend_morning, 2: weekend_mid, 3: helper}
             for staff in available[:3]:
                 sequence_number += 1
-                staffshifts.append(StaffShift(shift_date=day, staff=staff, shift=shift_mape[sequence_number]))
+                staffshifts.append(StaffShift(shift_date=day, staff=staff, shift_id=shift_mape[sequence_number].id))
                 if sequence_number == 3:
                     sequence_number = 0
                 person_shift_counts[staff] += 1
 
         for day in week.get("sundays", []):
-            available = [staff for staff in casual_list if person_shift_counts[staff] < 4 and day not in schedule[staff]]
+            available = [staff for staff in casual_list if person_shift_counts[staff] < 4 and day not in schedule[staff]
+                         and not on_leave(staff, day)]
             random.shuffle(available)
             sequence_number = 0
             shift_mape = {1: weekend_morning, 2: weekend_mid}
             for staff in available[:2]:
                 sequence_number += 1
-                staffshifts.append(StaffShift(shift_date=day, staff=staff, shift=shift_mape[sequence_number]))
+                staffshifts.append(StaffShift(shift_date=day, staff=staff, shift_id=shift_mape[sequence_number].id))
                 if sequence_number == 2:
                     sequence_number = 0
                 person_shift_counts[staff] += 1
 
     return staffshifts
 
-def generate_shifts(year: int, month: int):
-    manager = Members.objects.get(email='manager@example.com')
-    full_time = Members.objects.filter(position_type='full').exclude(id=manager.id).first()
-    casuals = list(Members.objects.filter(position_type='casual'))
+def casual_slots(week_list, rng, filled=None):
+    """
+    把每週需要 casual 的班表攤平成 Slot：
+    平日一個 Afternoon Shift，週六 Weekend Morning / Midday / Helper，週日 Weekend Morning / Midday
+    filled: {(day, shift_id): 已經存好的班數}，這些位置已經有人了，不再產生 Slot
+    """
+    after = shift_registry.by_name('Afternoon Shift')
+    weekend_morning = shift_registry.by_name('Weekend Morning')
+    weekend_mid = shift_registry.by_name('Weekend Midday')
+    helpers = shift_registry.all_by_name('Weekend Helper A') + shift_registry.all_by_name('Weekend Helper B')
+
+    def slot(day, shift):
+        return shift_slot(date.fromisoformat(day), shift)
+
+    slots = []
+    for week in week_list:
+        for day in week.get("weekdays", []):
+            slots.append(slot(day, after))
+        for day in week.get("saturdays", []):
+            slots.append(slot(day, weekend_morning))
+            slots.append(slot(day, weekend_mid))
+            if helpers:
+                slots.append(slot(day, rng.choice(helpers)))
+        for day in week.get("sundays", []):
+            slots.append(slot(day, weekend_morning))
+            slots.append(slot(day, weekend_mid))
+
+    if filled:
+        # the helper templates are drawn above either way, so the rng stays in step with a fresh month
+        filled = defaultdict(int, filled)
+        open_slots = []
+        for candidate in slots:
+            key = (candidate.day, candidate.shift_id)
+            if filled[key] > 0:
+                filled[key] -= 1
+            else:
+                open_slots.append(candidate)
+        slots = open_slots
+    return slots
+
+def shift_slot(day, shift):
+    """
+    Slot of a shift template (shift_registry entry) on day. Weekly caps count it in day's ISO
+    week, the same week whichever month the roster is generated for.
+    """
+    return Slot(day.isocalendar()[:2], day, shift.id, shift.start_time, shift.end_time, float(shift.work_hours))
+
+def booked_slots(rows):
+    """
+    (worker, Slot) for saved StaffShift rows, what RosterSolver.book() takes. Templates
+    without times can't clash with anything and are left out.
+    """
+    for shift_date, shift_id, cover_shift, staff_id, alternative_staff_id in rows.values_list(
+            'shift_date', 'shift_id', 'cover_shift', 'staff_id', 'alternative_staff_id'):
+        worker = worker_of(cover_shift, staff_id, alternative_staff_id)
+        shift = shift_registry.get(shift_id)
+        if worker and shift and shift.start_time and shift.end_time:
+            yield worker, shift_slot(shift_date, shift)
+
+def roster_limits():
+    return {
+        'max_weekly_hours': settings.ROSTER_MAX_WEEKLY_HOURS,
+        'max_weekly_shifts': settings.ROSTER_MAX_WEEKLY_SHIFTS,
+        'min_rest_hours': settings.ROSTER_MIN_REST_HOURS,
+    }
+
+def solver_weekly_schedule(week_list, casual_list, seed=None, leave_index=None, booked=(), filled=None):
+    """
+    用 RosterSolver 一次排完整個月的 casual 班表，取代 random.choice 反覆重排
+    """
+    rng = random.Random(seed)
+    slots = casual_slots(week_list, rng, filled)
+    solver = RosterSolver(
+        [staff.id for staff in casual_list],
+        seed=seed,
+        is_available=leave_index.is_available if leave_index else None,
+        booked=booked,
+        **roster_limits(),
+    )
+    assignments, uncovered = solver.solve(slots)
+    for slot in uncovered:
+        log.warning(f"roster solver: no casual available for shift {slot.shift_id} on {slot.day}")
+
+    return [StaffShift(shift_date=slot.day, staff_id=staff_id, shift_id=slot.shift_id)
+            for slot, staff_id in assignments]
+
+# strategy name -> callable(week_list, casual_list, seed, leave_index, booked, filled)
+ROSTER_STRATEGIES = {
+    'random': lambda week_list, casual_list, seed=None, leave_index=None, booked=(), filled=None: casual_weekly_schedule(week_list, casual_list, leave_index),
+    'solver': solver_weekly_schedule,
+}
+
+def boundary_bookings(first_day, last_day):
+    """
+    已經排好的前後月份班表：跨月那兩個 ISO 週的其他天，加上月初前、月底後休息時間會碰到的幾天，
+    讓 solver 排月初 / 月底時每週上限和休息時間都算到隔壁月份的班
+    """
+    margin = ConflictIndex().margin()
+    start = min(first_day - margin, first_day - timedelta(days=first_day.weekday()))
+    end = max(last_day + margin, last_day + timedelta(days=6 - last_day.weekday()))
+    rows = StaffShift.objects.filter(shift_date__range=(start, end)).exclude(
+        shift_date__range=(first_day, last_day))
+    return list(booked_slots(rows))
+
+def generated_templates():
+    """
+    ids of the shift templates build_roster puts people on
+    """
+    names = ['Morning Shift', 'Middle Shift', 'Afternoon Shift', 'Weekend Morning', 'Weekend Midday']
+    templates = [shift_registry.by_name(name) for name in names]
+    templates += shift_registry.all_by_name('Weekend Helper A') + shift_registry.all_by_name('Weekend Helper B')
+    return {template.id for template in templates if template}
+
+def replaceable_rows(first_day, last_day):
+    """
+    這個月之前產生、還沒發薪也沒人代班的班：重新產生這個月時由新的班表取代。
+    已發薪、代班、或是手動排在其他班別的班都會保留
+    """
+    return StaffShift.objects.filter(shift_date__range=(first_day, last_day), has_payslip=False,
+                                     cover_shift=False, shift_id__in=generated_templates())
 
-    morning = Shift.objects.filter(shift_name='Morning Shift').first()
-    mid = Shift.objects.filter(shift_name='Middle Shift').first()
+def saved_month(first_day, last_day):
+    """
+    這個月會保留下來的班（replaceable_rows 以外的）：算進每週上限和休息時間，
+    它們佔掉的 (day, shift_id) 位置也不再重排，所以重新產生同一個月不會重複排班
+    """
+    replaceable = replaceable_rows(first_day, last_day)
+    rows = StaffShift.objects.filter(shift_date__range=(first_day, last_day)).exclude(
+        id__in=replaceable.values('id'))
+    filled = defaultdict(int)
+    for shift_date, shift_id in rows.values_list('shift_date', 'shift_id'):
+        filled[(shift_date, shift_id)] += 1
+    return list(booked_slots(rows)), dict(filled)
 
+def roster_context(year: int, month: int):
+    """
+    一個月排班需要的資料：固定班的 manager / full time、casual 名單、週結構、請假索引和已經排好的班
+    """
+    manager = Members.objects.get(email='manager@example.com')
     week_list = generate_monthly_weeks(year, month)
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    booked, filled = saved_month(first_day, last_day)
+    return {
+        'manager': manager,
+        'full_time': Members.objects.filter(position_type='full', is_active=True).exclude(id=manager.id).first(),
+        'casuals': list(Members.objects.filter(position_type='casual', is_active=True)),
+        'morning': shift_registry.by_name('Morning Shift'),
+        'mid': shift_registry.by_name('Middle Shift'),
+        'week_list': week_list,
+        # 一次載入整個月的請假，之後每次檢查都在記憶體裡 bisect
+        'leave_index': LeaveIndex.for_period(first_day, last_day),
+        'booked': boundary_bookings(first_day, last_day) + booked,
+        'filled': filled,
+    }
+
+def fulltime_assignments(context):
+    """
+    manager and full time staff's shift: every weekday, unless they are on leave
+    """
+    leave_index = context['leave_index']
+    for week in context['week_list']:
+        for day in week['weekdays']:
+            day = date.fromisoformat(day)
+            for staff, shift in ((context['manager'], context['morning']), (context['full_time'], context['mid'])):
+                if leave_index.is_on_leave(staff.id, day):
+                    log.info(f"{staff} is on leave on {day}, not rostered")
+                    continue
+                yield day, staff, shift
+
+def build_roster(year: int, month: int, strategy: str = 'solver'):
+    """
+    產生整個月的 StaffShift（尚未寫入資料庫）
+    """
+    if strategy not in ROSTER_STRATEGIES:
+        raise ValueError(f"unknown roster strategy '{strategy}', choose from {sorted(ROSTER_STRATEGIES)}")
+
+    context = roster_context(year, month)
+    fulltime_staffshifts = [StaffShift(shift_date=day, staff=staff, shift_id=shift.id)
+                            for day, staff, shift in fulltime_assignments(context)]
+
+    # same month, same roster: the solver is seeded so a re-run reproduces its previous answer
+    casual_staffshifts = ROSTER_STRATEGIES[strategy](context['week_list'], context['casuals'],
+                                                     seed=year * 100 + month,
+                                                     leave_index=context['leave_index'],
+                                                     booked=context['booked'],
+                                                     filled=context['filled'])
+    return fulltime_staffshifts + casual_staffshifts
+
+ROSTER_UNIQUE_FIELDS = ['staff', 'shift_date', 'shift']
+
+def stale_row_ids(staffshifts, replace):
+    """
+    ids of the rows in `replace` (a StaffShift queryset) the roster doesn't produce again
+    """
+    if replace is None:
+        return []
+    keys = {(row.staff_id, as_date(row.shift_date), row.shift_id) for row in staffshifts}
+    return [row_id for row_id, staff_id, shift_date, shift_id
+            in replace.values_list('id', 'staff_id', 'shift_date', 'shift_id')
+            if (staff_id, shift_date, shift_id) not in keys]
+
+def save_roster(staffshifts, batch_size=None, replace=None):
+    """
+    Upsert on (staff, shift_date, shift): rows that already exist are left as they are, so
+    running the same roster twice writes nothing new. update_conflicts (instead of
+    ignore_conflicts) is used because it still hands back the primary key of every row.
+
+    replace: saved rows the roster supersedes (see replaceable_rows); the ones it doesn't
+    produce again are deleted in the same transaction, before the upsert.
+    A roster that overlaps or breaks rest gaps (within itself or with the saved rows it keeps)
+    raises RosterConflictError before anything is written.
+    """
+    with transaction.atomic():
+        stale_ids = stale_row_ids(staffshifts, replace)
+        conflicts = roster_conflicts(staffshifts, exclude_ids=stale_ids)
+        if conflicts:
+            raise RosterConflictError(conflicts)
+
+        if stale_ids:
+            StaffShift.objects.filter(id__in=stale_ids).delete()
+        saved = StaffShift.objects.bulk_create(
+            staffshifts,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=ROSTER_UNIQUE_FIELDS,
+            # a generated row carries nothing beyond its key, never overwrite cover / payslip flags
+            update_fields=['shift'],
+        )
+    staffshifts_written(staffshift.shift_date for staffshift in staffshifts)
+    return saved
+
+def generate_shifts(year: int, month: int, strategy: str = 'solver'):
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    return save_roster(build_roster(year, month, strategy), replace=replaceable_rows(first_day, last_day))
+
+def preview_roster(year: int, month: int, strategy: str = 'solver'):
+    """
+    Dry run: the proposed roster plus how it differs from what is already saved for the month.
+    Nothing is written.
+    """
+    proposed = build_roster(year, month, strategy)
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    existing = {
+        (row['staff_id'], row['shift_date'], row['shift_id']): row
+        for row in StaffShift.objects.filter(shift_date__range=(first_day, last_day))
+        .values('id', 'staff_id', 'shift_date', 'shift_id', 'cover_shift', 'alternative_staff_id', 'has_payslip')
+    }
+
+    staff_ids = {row.staff_id for row in proposed} | {key[0] for key in existing}
+    names = {member.id: str(member) for member in Members.objects.filter(id__in=staff_ids)}
+
+    def describe(staff_id, shift_date, shift_id, **extra):
+        return {'shift_date': str(shift_date), 'staff': staff_id, 'staff_name': names.get(staff_id),
+                'shift': shift_id, 'shift_name': shift_registry.display(shift_id), **extra}
+
+    proposed_keys = set()
+    rows, create = [], []
+    for row in proposed:
+        key = (row.staff_id, as_date(row.shift_date), row.shift_id)
+        proposed_keys.add(key)
+        item = describe(*key)
+        rows.append(item)
+        if key not in existing:
+            create.append(item)
+
+    # saved rows the new roster would not produce: earlier generated rows are deleted on commit,
+    # paid, covered and manually added ones are kept
+    replaceable = set(replaceable_rows(first_day, last_day).values_list('id', flat=True))
+    replace, not_in_proposal = [], []
+    for key, row in existing.items():
+        if key in proposed_keys:
+            continue
+        item = describe(key[0], key[1], key[2], id=row['id'], cover_shift=row['cover_shift'],
+                        has_payslip=row['has_payslip'])
+        (replace if row['id'] in replaceable else not_in_proposal).append(item)
+
+    return {
+        'year': year,
+        'month': month,
+        'strategy': strategy,
+        'roster': rows,
+        'diff': {
+            'create': create,
+            'unchanged': len(proposed_keys) - len(create),
+            'replace': replace,
+            'not_in_proposal': not_in_proposal,
+        },
+        # non-empty means saving this roster would be rejected
+        'conflicts': roster_conflicts(proposed, exclude_ids=[item['id'] for item in replace]),
+    }
+
+def month_problem(year: int, month: int):
+    """
+    把一個月的排班整理成純資料（不含 model instance），可以丟給 ProcessPoolExecutor 的 worker 解
+    """
+    context = roster_context(year, month)
+    seed = year * 100 + month
+    return {
+        'month': (year, month),
+        'fixed': [(day, staff.id, shift.id) for day, staff, shift in fulltime_assignments(context)],
+        'slots': casual_slots(context['week_list'], random.Random(seed), context['filled']),
+        'staff_ids': [staff.id for staff in context['casuals']],
+        'leave_index': context['leave_index'],
+        'booked': context['booked'],
+        'limits': roster_limits(),
+        'seed': seed,
+    }
+
+def following_months(year: int, month: int, months: int):
+    for offset in range(months):
+        y, m = divmod(month - 1 + offset, 12)
+        yield year + y, m + 1
+
+def generate_shifts_batch(year: int, month: int, months: int = 3, workers=None,
+                          compare_serial=False, commit=True, batch_size=1000):
+    """
+    一次產生多個月的班表：每個月各自是獨立的問題，在 process pool 裡平行求解，
+    最後合併成一次 bulk_create。compare_serial=True 時會再用單一 process 跑一次來計算加速比
+    """
+    problems = [month_problem(y, m) for y, m in following_months(year, month, months)]
+
+    started = time.perf_counter()
+    parallel = can_use_process_pool(workers)
+    if not parallel:
+        results = [solve_month(problem) for problem in problems]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(solve_month, problems))
+    parallel_seconds = time.perf_counter() - started
+
+    report = {
+        'months': [f"{y}-{m:02d}" for y, m in (result['month'] for result in results)],
+        'rows': sum(len(result['rows']) for result in results),
+        'uncovered': sum(result['uncovered'] for result in results),
+        'parallel_seconds': round(parallel_seconds, 3),
+        # False when the months were solved one after another in this process
+        'process_pool': parallel,
+    }
+
+    if compare_serial:
+        started = time.perf_counter()
+        for problem in problems:
+            solve_month(problem)
+        serial_seconds = time.perf_counter() - started
+        report['serial_seconds'] = round(serial_seconds, 3)
+        report['speedup'] = round(serial_seconds / parallel_seconds, 2) if parallel_seconds else None
+
+    if commit:
+        # each month is saved on its own so a conflict in one month doesn't throw away the others
+        report['saved'], report['failed'] = [], {}
+        for result in results:
+            y, m = result['month']
+            label = f"{y}-{m:02d}"
+            staffshifts = [StaffShift(shift_date=day, staff_id=staff_id, shift_id=shift_id)
+                           for day, staff_id, shift_id in result['rows']]
+            replace = replaceable_rows(date(y, m, 1), date(y, m, calendar.monthrange(y, m)[1]))
+            try:
+                save_roster(staffshifts, batch_size=batch_size, replace=replace)
+            except RosterConflictError as e:
+                report['failed'][label] = e.conflicts
+                continue
+            report['saved'].append(label)
+
+    log.info(f"roster batch generated: {report}")
+    return report
+
+class RosterDiff:
+    """
+    Minimal set of StaffShift changes: rows to insert, rows to update (with the fields that
+    changed) and rows to delete. apply() writes all of them in one transaction.
+    """
+
+    def __init__(self):
+        self.creates = []
+        self.updates = []
+        self.deletes = []
+        self.update_fields = set()
+
+    def __bool__(self):
+        return bool(self.creates or self.updates or self.deletes)
+
+    def summary(self):
+        return {'created': len(self.creates), 'updated': len(self.updates), 'deleted': len(self.deletes)}
+
+    def apply(self):
+        with transaction.atomic():
+            if self.deletes:
+                StaffShift.objects.filter(id__in=[row.id for row in self.deletes]).delete()
+            if self.updates:
+                StaffShift.objects.bulk_update(self.updates, sorted(self.update_fields))
+            if self.creates:
+                StaffShift.objects.bulk_create(self.creates)
+            if self.updates or self.creates:
+                staffshifts_written(row.shift_date for row in self.updates + self.creates)
+        return self.summary()
+
+def repair_roster(staff_id, start_date=None, end_date=None):
+    """
+    staff_id 不能上班了（請假核准 / 帳號停用）：只重排他在 start_date ~ end_date 之間還沒發薪的班，
+    其他人的班（包含手動調整過的）都不動。回傳 RosterDiff，由呼叫端決定要不要 apply()
+    """
+    today = date.today()
+    start_date = max(start_date or today, today)
+
+    # rows staff_id is actually working: their own shifts, or shifts they agreed to cover
+    affected = StaffShift.objects.filter(has_payslip=False, shift_date__gte=start_date).filter(
+        Q(staff_id=staff_id, cover_shift=False) | Q(alternative_staff_id=staff_id, cover_shift=True)
+    )
+    if end_date:
+        affected = affected.filter(shift_date__lte=end_date)
+    affected = list(affected)
+
+    diff = RosterDiff()
+    if not affected:
+        return diff
+
+    # whole ISO weeks around the affected days, so weekly caps and rest gaps see every booked row
+    first_day = min(row.shift_date for row in affected)
+    last_day = max(row.shift_date for row in affected)
+    window_start = first_day - timedelta(days=first_day.weekday() + 1)
+    window_end = last_day + timedelta(days=7 - last_day.weekday())
+
+    position_type = Members.objects.filter(id=staff_id).values_list('position_type', flat=True).first()
+    candidates = list(Members.objects.filter(
+        is_active=True, is_superuser=False, position_type__in=[position_type, 'casual'],
+    ).exclude(id=staff_id).values_list('id', flat=True))
+    leave_index = LeaveIndex.for_period(window_start, window_end)
+
+    solver = RosterSolver(candidates, seed=staff_id, is_available=leave_index.is_available, **roster_limits())
+
+    booked = StaffShift.objects.filter(shift_date__range=(window_start, window_end)).exclude(
+        id__in=[row.id for row in affected])
+    for worker, slot in booked_slots(booked):
+        solver.book(worker, slot)
+
+    chosen = solver.solve_positions([shift_slot(row.shift_date, shift_registry.get(row.shift_id))
+                                     for row in affected])
+    for index, row in enumerate(affected):
+        if index not in chosen:
+            log.warning(f"roster repair: nobody can take {row.shift_date} {shift_registry.display(row.shift_id)} from staff {staff_id}, removing it")
+            diff.deletes.append(row)
+        elif row.cover_shift:
+            row.alternative_staff_id = chosen[index]
+            diff.updates.append(row)
+            diff.update_fields.add('alternative_staff')
+        else:
+            row.staff_id = chosen[index]
+            diff.updates.append(row)
+            diff.update_fields.add('staff')
 
-    # manager and full time staff's shift
-    weekdays = [week['weekdays'] for week in week_list]
-    fulltime_staffshifts = []
-    for weekday in weekdays:
-        for day in weekday:
-            fulltime_staffshifts.append(StaffShift(shift_date=day, staff=manager, shift=morning))
-            fulltime_staffshifts.append(StaffShift(shift_date=day, staff=full_time, shift=mid))
-    
-    casual_staffshifts = casual_weekly_schedule(week_list, casuals)
-    staffshifts = fulltime_staffshifts + casual_staffshifts
-    
-    StaffShift.objects.bulk_create(staffshifts)
\ No newline at end of file
+    return diff
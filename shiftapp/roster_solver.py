@@ -0,0 +1,246 @@
+"""
+Roster solver used by roster_maker.generate_shifts.
+
+The solver works on plain data only (staff ids, template ids, dates and times) so it can run
+without touching the ORM. Every (day, shift) that needs a person is a Slot; the solver fills
+slots greedily, always offering the slot to the least loaded staff member who satisfies the
+weekly hour / shift caps and the minimum rest gap, then runs a small local search that tries
+to cover any slot left empty by moving someone off another slot in the same week.
+"""
+import time
+import heapq
+import random
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+DEFAULT_MAX_WEEKLY_HOURS = 38
+DEFAULT_MAX_WEEKLY_SHIFTS = 4
+DEFAULT_MIN_REST_HOURS = 10
+
+# week: ISO (year, week) of day, the week the weekly caps are counted in
+Slot = namedtuple('Slot', ['week', 'day', 'shift_id', 'start_time', 'end_time', 'hours'])
+
+
+def shift_window(day, start_time, end_time):
+    """
+    Actual start / end datetimes of a shift on day; an overnight shift ends the next day.
+    """
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+class StaffTimeline:
+    """
+    One staff member's booked shift windows, kept sorted so that overlap and rest-gap checks
+    only need to look at the neighbours of the insertion point (O(log n)).
+    """
+
+    def __init__(self):
+        self.windows = []
+
+    def add(self, start, end):
+        insort(self.windows, (start, end))
+
+    def remove(self, start, end):
+        i = bisect_left(self.windows, (start, end))
+        if i < len(self.windows) and self.windows[i] == (start, end):
+            del self.windows[i]
+
+    def conflict(self, start, end, min_rest):
+        """
+        Return 'overlap' or 'rest' when [start, end) clashes with a booked window, else None.
+        """
+        i = bisect_left(self.windows, (start, end))
+        if i > 0:
+            prev_start, prev_end = self.windows[i - 1]
+            if prev_end > start:
+                return 'overlap'
+            if start - prev_end < min_rest:
+                return 'rest'
+        if i < len(self.windows):
+            next_start, next_end = self.windows[i]
+            if next_start < end:
+                return 'overlap'
+            if next_start - end < min_rest:
+                return 'rest'
+        return None
+
+
+class RosterSolver:
+    """
+    Assign staff to slots in one pass.
+
+    Hard constraints: a staff member is available that day, does not exceed max_weekly_hours
+    or max_weekly_shifts within a week, and has at least min_rest_hours between shifts.
+    Soft goal: spread hours evenly, which is what keeps later weeks coverable.
+    """
+
+    def __init__(self, staff_ids, max_weekly_hours=DEFAULT_MAX_WEEKLY_HOURS,
+                 max_weekly_shifts=DEFAULT_MAX_WEEKLY_SHIFTS,
+                 min_rest_hours=DEFAULT_MIN_REST_HOURS, seed=None, is_available=None, booked=()):
+        self.staff_ids = list(staff_ids)
+        self.max_weekly_hours = max_weekly_hours
+        self.max_weekly_shifts = max_weekly_shifts
+        self.min_rest = timedelta(hours=min_rest_hours)
+        self.rng = random.Random(seed)
+
+        self.timelines = defaultdict(StaffTimeline)
+        self.week_hours = defaultdict(float)
+        self.week_shifts = defaultdict(int)
+        self.total_hours = defaultdict(float)
+        self.assignments = {}
+        # the assigned slots of each week, in assignment order, for repair()
+        self.week_slots = defaultdict(dict)
+        # is_available(staff_id, day) -> bool, everyone is available unless told otherwise
+        self.is_available = is_available or (lambda staff_id, day: True)
+
+        # booked: (staff_id, Slot) already on the roster outside the problem (e.g. the
+        # neighbouring months), counted against the caps and rest gaps but never reassigned
+        for staff_id, slot in booked:
+            self.book(staff_id, slot)
+
+    def can_take(self, staff_id, slot):
+        key = (staff_id, slot.week)
+        if self.week_shifts[key] >= self.max_weekly_shifts:
+            return False
+        if self.week_hours[key] + slot.hours > self.max_weekly_hours:
+            return False
+        if not self.is_available(staff_id, slot.day):
+            return False
+        start, end = shift_window(slot.day, slot.start_time, slot.end_time)
+        return self.timelines[staff_id].conflict(start, end, self.min_rest) is None
+
+    def book(self, staff_id, slot):
+        """
+        Count a shift against staff_id's caps and rest gaps without making it part of the
+        answer, used for rows that already exist in the roster.
+        """
+        key = (staff_id, slot.week)
+        self.week_shifts[key] += 1
+        self.week_hours[key] += slot.hours
+        self.total_hours[staff_id] += slot.hours
+        self.timelines[staff_id].add(*shift_window(slot.day, slot.start_time, slot.end_time))
+
+    def unbook(self, staff_id, slot):
+        key = (staff_id, slot.week)
+        self.week_shifts[key] -= 1
+        self.week_hours[key] -= slot.hours
+        self.total_hours[staff_id] -= slot.hours
+        self.timelines[staff_id].remove(*shift_window(slot.day, slot.start_time, slot.end_time))
+
+    def assign(self, staff_id, slot):
+        self.book(staff_id, slot)
+        self.assignments[slot] = staff_id
+        self.week_slots[slot.week][slot] = staff_id
+
+    def unassign(self, slot):
+        staff_id = self.assignments.pop(slot)
+        del self.week_slots[slot.week][slot]
+        self.unbook(staff_id, slot)
+        return staff_id
+
+    def solve(self, slots):
+        """
+        Fill slots and return (assignments, uncovered) where assignments is a list of
+        (slot, staff_id). Identical slots (same day and template) are allowed and are
+        treated as separate positions.
+        """
+        chosen = self.solve_positions(slots)
+        assignments = [(slots[index], chosen[index]) for index in sorted(chosen, key=lambda i: (slots[i].day, slots[i].start_time, i))]
+        uncovered = [slot for index, slot in enumerate(slots) if index not in chosen]
+        return assignments, uncovered
+
+    def solve_positions(self, slots):
+        """
+        Same as solve() but returns {index in slots: staff_id} for the covered slots, so a
+        caller can map answers back to the rows the slots came from.
+        """
+        # a unique position number keeps duplicated slots apart in self.assignments
+        positions = sorted(
+            (slot._replace(shift_id=(slot.shift_id, index)) for index, slot in enumerate(slots)),
+            key=lambda slot: (slot.day, slot.start_time, slot.shift_id[1]),
+        )
+
+        # least loaded first, random tie-break so the same people don't always get the weekend
+        order = list(self.staff_ids)
+        self.rng.shuffle(order)
+        heap = [(self.total_hours[staff_id], rank, staff_id) for rank, staff_id in enumerate(order)]
+        heapq.heapify(heap)
+
+        uncovered = []
+        for slot in positions:
+            skipped = []
+            chosen = None
+            while heap:
+                hours, rank, staff_id = heapq.heappop(heap)
+                if self.can_take(staff_id, slot):
+                    chosen = (rank, staff_id)
+                    break
+                skipped.append((hours, rank, staff_id))
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+
+            if chosen is None:
+                uncovered.append(slot)
+                continue
+            rank, staff_id = chosen
+            self.assign(staff_id, slot)
+            heapq.heappush(heap, (self.total_hours[staff_id], rank, staff_id))
+
+        for slot in uncovered:
+            self.repair(slot)
+
+        return {slot.shift_id[1]: staff_id for slot, staff_id in self.assignments.items()}
+
+    def repair(self, slot):
+        """
+        Local search for an uncovered slot: find someone A already working this week who could
+        take the slot if their own slot went to a currently idle person B.
+        """
+        # B needs room for one more shift this week, which no move changes; least loaded first
+        spare = sorted((staff_id for staff_id in self.staff_ids
+                        if self.week_shifts[(staff_id, slot.week)] < self.max_weekly_shifts
+                        and self.week_hours[(staff_id, slot.week)] < self.max_weekly_hours),
+                       key=lambda staff_id: self.total_hours[staff_id])
+        if not spare:
+            return False
+
+        for other in list(self.week_slots[slot.week]):
+            staff_a = self.unassign(other)
+            if self.can_take(staff_a, slot):
+                self.assign(staff_a, slot)
+                for staff_b in spare:
+                    if staff_b != staff_a and self.can_take(staff_b, other):
+                        self.assign(staff_b, other)
+                        return True
+                self.unassign(slot)
+            self.assign(staff_a, other)
+        return False
+
+
+def solve_month(problem):
+    """
+    Process-pool entry point. problem is the plain dict built by roster_maker.month_problem;
+    returns the month's rows as (shift_date, staff_id, shift_id) tuples.
+    """
+    started = time.perf_counter()
+    leave_index = problem['leave_index']
+    solver = RosterSolver(
+        problem['staff_ids'],
+        seed=problem['seed'],
+        is_available=leave_index.is_available if leave_index else None,
+        booked=problem['booked'],
+        **problem['limits'],
+    )
+    assignments, uncovered = solver.solve(problem['slots'])
+    rows = list(problem['fixed']) + [(slot.day, staff_id, slot.shift_id) for slot, staff_id in assignments]
+    return {
+        'month': problem['month'],
+        'rows': rows,
+        'uncovered': len(uncovered),
+        'seconds': time.perf_counter() - started,
+    }
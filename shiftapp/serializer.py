@@ -1,9 +1,13 @@
 from decimal import Decimal
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Max, Min
 from rest_framework import serializers
 from datetime import datetime, timedelta
-from .models import Members, Shift, StaffShift, LeaveRequest, LeaveBalance, Wage
+from .models import Members, Shift, StaffShift, LeaveRequest, LeaveBalance, Wage, WageRollup
+from .conflicts import ConflictIndex, worker_of
+from .roster_cache import staffshifts_written
+from .shift_registry import shift_registry
 
 
 class MemberSerializer(serializers.ModelSerializer):
@@ -64,7 +68,7 @@ class ShiftSerializer(serializers.ModelSerializer):
 class StaffShiftSerializer(serializers.ModelSerializer):
     staff_name = serializers.SerializerMethodField()
     alternative_staff_name = serializers.SerializerMethodField()
-    shift_name = serializers.StringRelatedField()
+    shift_name = serializers.SerializerMethodField()
     class Meta:
         model = StaffShift
         fields = ['id', "shift_date", "staff", "staff_name", "shift", "shift_name", 
@@ -72,7 +76,7 @@ class StaffShiftSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
         
     def get_shift_name(self, obj):
-        return str(obj.shift)
+        return shift_registry.display(obj.shift_id)
 
     def get_staff_name(self, obj):
         return str(obj.staff)
@@ -97,9 +101,204 @@ class StaffShiftSerializer(serializers.ModelSerializer):
             alt_staff_id = data.get('alternative_staff')
             if not alt_staff_id:
                 raise serializers.ValidationError({'alternative_staff': 'alternative_staff is required'})
-        
+
+        # overlaps and rest gaps of the row as it will be saved, partial updates keep the other fields
+        instance = self.instance
+        shift_date = data.get('shift_date', instance.shift_date if instance else None)
+        staff_id = data['staff'].pk if data.get('staff') else (instance.staff_id if instance else None)
+        shift_id = data['shift'].pk if data.get('shift') else (instance.shift_id if instance else None)
+        if 'cover_shift' not in data and instance:
+            cover_shift = instance.cover_shift
+        if 'alternative_staff' in data:
+            alternative_staff_id = data['alternative_staff'].pk if data['alternative_staff'] else None
+        else:
+            alternative_staff_id = instance.alternative_staff_id if instance else None
+
+        worker = worker_of(cover_shift, staff_id, alternative_staff_id)
+        if shift_date and shift_id and worker:
+            index = ConflictIndex.for_rows([shift_date], workers=[worker], exclude_ids=[instance.pk] if instance else ())
+            conflict = index.check(worker, shift_date, shift_id)
+            if conflict:
+                raise serializers.ValidationError({'shift': index.message(conflict)})
+
+        return data
+
+
+class StaffShiftBulkItemSerializer(serializers.Serializer):
+    """
+    One row of a bulk roster edit. Foreign keys are plain ids here and checked for the whole
+    batch at once in StaffShiftBulkSerializer, instead of one lookup per field per row.
+    """
+    id = serializers.IntegerField(required=False)
+    shift_date = serializers.DateField(required=False)
+    staff = serializers.IntegerField(required=False)
+    shift = serializers.IntegerField(required=False)
+    cover_shift = serializers.BooleanField(required=False)
+    alternative_staff = serializers.IntegerField(required=False, allow_null=True)
+
+
+class StaffShiftBulkSerializer(serializers.Serializer):
+    """
+    {"create": [...], "update": [{"id": ..., changed fields}], "delete": [ids]}
+    Validated with a fixed number of queries whatever the batch size, and applied in one
+    transaction with bulk_create / bulk_update.
+    """
+    MAX_ITEMS = 1000
+    FIELDS = ['shift_date', 'staff', 'shift', 'cover_shift', 'alternative_staff']
+
+    create = StaffShiftBulkItemSerializer(many=True, required=False)
+    update = StaffShiftBulkItemSerializer(many=True, required=False)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate(self, data):
+        creates = data.setdefault('create', [])
+        updates = data.setdefault('update', [])
+        deletes = data.setdefault('delete', [])
+
+        if not creates and not updates and not deletes:
+            raise serializers.ValidationError('nothing to create, update or delete')
+        if len(creates) + len(updates) + len(deletes) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f'at most {self.MAX_ITEMS} items per request')
+
+        # one query for the rows being changed, one for every staff id mentioned
+        existing = StaffShift.objects.in_bulk([item['id'] for item in updates if 'id' in item] + deletes)
+        staff_ids = {item[field] for item in creates + updates
+                     for field in ('staff', 'alternative_staff') if item.get(field)}
+        known_staff = set(Members.objects.filter(id__in=staff_ids).values_list('id', flat=True))
+
+        create_errors = [{} for _ in creates]
+        update_errors = [{} for _ in updates]
+        delete_errors = [{} for _ in deletes]
+
+        # final (staff, shift_date, shift) of every row the batch creates or updates
+        rows = []
+        for i, item in enumerate(creates):
+            for field in ['shift_date', 'staff', 'shift']:
+                if item.get(field) is None:
+                    create_errors[i][field] = f'{field} is required'
+            rows.append((create_errors[i], None, item))
+
+        seen = set()
+        for i, item in enumerate(updates):
+            staffshift = existing.get(item.get('id'))
+            if 'id' not in item:
+                update_errors[i]['id'] = 'id is required'
+            elif staffshift is None:
+                update_errors[i]['id'] = 'not found'
+            elif item['id'] in seen:
+                update_errors[i]['id'] = 'updated more than once'
+            else:
+                seen.add(item['id'])
+                merged = {field: item.get(field, getattr(staffshift, f'{field}_id' if field in ('staff', 'shift', 'alternative_staff') else field))
+                          for field in self.FIELDS}
+                rows.append((update_errors[i], staffshift.id, merged))
+
+        for i, staffshift_id in enumerate(deletes):
+            if staffshift_id not in existing:
+                delete_errors[i]['id'] = 'not found'
+            elif staffshift_id in seen:
+                delete_errors[i]['id'] = 'also in update'
+
+        for errors, _, row in rows:
+            if row.get('staff') and row['staff'] not in known_staff:
+                errors['staff'] = 'not found'
+            if row.get('shift') and shift_registry.get(row['shift']) is None:
+                errors['shift'] = 'not found'
+            if row.get('cover_shift'):
+                if not row.get('alternative_staff'):
+                    errors['alternative_staff'] = 'alternative_staff is required'
+                elif row['alternative_staff'] not in known_staff:
+                    errors['alternative_staff'] = 'not found'
+
+        # unique (staff, shift_date, shift): within the batch, then against rows the batch leaves alone
+        keys = {}
+        for errors, staffshift_id, row in rows:
+            if errors:
+                continue
+            key = (row['staff'], row['shift_date'], row['shift'])
+            if key in keys:
+                errors['non_field_errors'] = 'duplicates another row of this request'
+            keys[key] = staffshift_id
+        if keys:
+            # rows being updated or deleted give up their current key
+            clashes = set(StaffShift.objects.filter(
+                staff_id__in={key[0] for key in keys},
+                shift_date__in={key[1] for key in keys},
+                shift_id__in={key[2] for key in keys},
+            ).exclude(id__in=list(existing)).values_list('staff_id', 'shift_date', 'shift_id'))
+            for errors, _, row in rows:
+                if not errors and (row['staff'], row['shift_date'], row['shift']) in clashes:
+                    errors['non_field_errors'] = 'staff already has this shift on this date'
+
+        # overlaps and rest gaps: one range query for the whole batch, then checked row by row
+        # in date order so rows of the batch clash with each other too
+        valid = sorted((row['shift_date'], row['staff'], i, errors, row) for i, (errors, _, row) in enumerate(rows) if not errors)
+        if valid:
+            workers = {worker_of(row.get('cover_shift'), row['staff'], row.get('alternative_staff')) for *_, row in valid}
+            index = ConflictIndex.for_rows([day for day, *_ in valid], workers=workers, exclude_ids=existing)
+            for day, _, _, errors, row in valid:
+                worker = worker_of(row.get('cover_shift'), row['staff'], row.get('alternative_staff'))
+                conflict = index.check(worker, day, row['shift'])
+                if conflict:
+                    errors['non_field_errors'] = index.message(conflict)
+                else:
+                    index.add(worker, day, row['shift'])
+
+        if any(create_errors) or any(update_errors) or any(delete_errors):
+            raise serializers.ValidationError({
+                key: value for key, value in (('create', create_errors), ('update', update_errors), ('delete', delete_errors))
+                if any(value)
+            })
+
+        self._existing = existing
         return data
 
+    def save(self, **kwargs):
+        # the 'create' / 'update' fields take the names of Serializer.create() / update()
+        self.instance = self.apply({**self.validated_data, **kwargs})
+        return self.instance
+
+    def apply(self, validated_data):
+        """
+        Returns {'create': [rows], 'update': [rows], 'delete': [ids]}, in request order.
+        """
+        existing = self._existing
+        # dates the changed rows are leaving, before they are changed in place
+        old_days = [staffshift.shift_date for staffshift in existing.values()]
+        changed_fields = set()
+        updated = []
+        for item in validated_data['update']:
+            staffshift = existing[item['id']]
+            for field in self.FIELDS:
+                if field in item:
+                    attname = f'{field}_id' if field in ('staff', 'shift', 'alternative_staff') else field
+                    setattr(staffshift, attname, item[field])
+                    changed_fields.add(field)
+            updated.append(staffshift)
+
+        created = [
+            StaffShift(shift_date=item['shift_date'], staff_id=item['staff'], shift_id=item['shift'],
+                       cover_shift=item.get('cover_shift', False), alternative_staff_id=item.get('alternative_staff'))
+            for item in validated_data['create']
+        ]
+
+        with transaction.atomic():
+            if validated_data['delete']:
+                StaffShift.objects.filter(id__in=validated_data['delete']).delete()
+            if updated and changed_fields:
+                StaffShift.objects.bulk_update(updated, sorted(changed_fields), batch_size=500)
+            StaffShift.objects.bulk_create(created, batch_size=500)
+            staffshifts_written(old_days + [staffshift.shift_date for staffshift in created + updated])
+
+        # reload once with the names the response shows
+        ids = [staffshift.id for staffshift in created + updated]
+        rows = StaffShift.objects.select_related('staff', 'alternative_staff').in_bulk(ids)
+        return {
+            'create': [StaffShiftSerializer(rows[staffshift.id]).data for staffshift in created],
+            'update': [StaffShiftSerializer(rows[staffshift.id]).data for staffshift in updated],
+            'delete': validated_data['delete'],
+        }
+
 
 class LeaveRequestSerializer(serializers.ModelSerializer):
     staff = serializers.StringRelatedField()
@@ -227,13 +426,17 @@ class LeaveBalanceSerializer(serializers.ModelSerializer):
 
 class WageSerializer(serializers.ModelSerializer):
     staff = serializers.StringRelatedField()
-    shift = serializers.StringRelatedField()
+    shift = serializers.SerializerMethodField()
 
     class Meta:
         model = Wage
         fields = ['id', 'staff', 'shift', 'pay_date', 'salary']
         read_only_fields = ['id']
 
+    def get_shift(self, obj):
+        # same text as str(StaffShift), without loading the Shift row
+        return f"shift_date: {obj.shift.shift_date} - {shift_registry.display(obj.shift.shift_id)}"
+
     def to_representation(self, instance):
         rep = super().to_representation(instance)
 
@@ -246,4 +449,13 @@ class WageSerializer(serializers.ModelSerializer):
     #     return str(Wage.objects.aggregate(Max('shift_date'))['shift_date__max'] or '')
 
     # def get_shift_date_min(self, obj):
-    #     return str(Wage.objects.aggregate(Min('shift_date'))['shift_date__min'] or '')
\ No newline at end of file
+    #     return str(Wage.objects.aggregate(Min('shift_date'))['shift_date__min'] or '')
+
+
+class WageRollupSerializer(serializers.ModelSerializer):
+    staff = serializers.StringRelatedField()
+
+    class Meta:
+        model = WageRollup
+        fields = ['staff_id', 'staff', 'period_type', 'period_start', 'period_end', 'shifts', 'hours', 'salary', 'tax_withheld']
+        read_only_fields = fields
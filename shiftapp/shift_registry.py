@@ -0,0 +1,101 @@
+import time
+import threading
+from collections import defaultdict, namedtuple
+
+from .caching import resource_version
+from .models import Shift
+
+# how often the shared 'shift' version is read to catch Shift writes made by other processes
+RECHECK_SECONDS = 1
+
+# display: same text as str(Shift), work_hours: same value as Shift.daily_work_hours()
+ShiftTemplate = namedtuple('ShiftTemplate', [
+    'id', 'shift_name', 'start_time', 'end_time', 'break_min',
+    'display', 'work_duration', 'work_hours',
+])
+
+
+class ShiftRegistry:
+    """
+    Process-wide cache of the Shift templates.
+
+    There are only a handful of templates but the roster maker, payroll and serializers look
+    them up for every row, so they are loaded with one query, formatted once, and kept until a
+    Shift is saved or deleted (see signals.py). A write in another process bumps the shared
+    'shift' version (caching.py), which is picked up within RECHECK_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_name = None
+        self._version = None
+        self._checked_at = 0
+
+    def _load(self):
+        by_id = {}
+        by_name = defaultdict(list)
+        for shift in Shift.objects.order_by('id'):
+            if shift.start_time and shift.end_time:
+                display = str(shift)
+            else:
+                display = shift.shift_name
+            template = ShiftTemplate(
+                id=shift.id,
+                shift_name=shift.shift_name,
+                start_time=shift.start_time,
+                end_time=shift.end_time,
+                break_min=shift.break_min,
+                display=display,
+                work_duration=shift.daily_work_duration(),
+                work_hours=shift.daily_work_hours(),
+            )
+            by_id[shift.id] = template
+            by_name[shift.shift_name].append(template)
+        return by_id, dict(by_name)
+
+    def _stale(self):
+        return self._by_id is None or time.monotonic() - self._checked_at >= RECHECK_SECONDS
+
+    def _templates(self):
+        by_id, by_name = self._by_id, self._by_name
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    # read before loading, so a write during the load is seen on the next check
+                    version, _ = resource_version('shift')
+                    if self._by_id is None or version != self._version:
+                        self._by_id, self._by_name = self._load()
+                        self._version = version
+                    self._checked_at = time.monotonic()
+                by_id, by_name = self._by_id, self._by_name
+        return by_id, by_name
+
+    def get(self, shift_id):
+        return self._templates()[0].get(shift_id)
+
+    def by_name(self, shift_name):
+        """
+        Same as Shift.objects.filter(shift_name=...).first()
+        """
+        templates = self._templates()[1].get(shift_name)
+        return templates[0] if templates else None
+
+    def all_by_name(self, shift_name):
+        return list(self._templates()[1].get(shift_name, []))
+
+    def display(self, shift_id):
+        template = self.get(shift_id)
+        return template.display if template else None
+
+    def all(self):
+        return list(self._templates()[0].values())
+
+    def invalidate(self):
+        with self._lock:
+            self._by_id = None
+            self._by_name = None
+            self._version = None
+
+
+shift_registry = ShiftRegistry()
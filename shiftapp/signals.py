@@ -0,0 +1,76 @@
+from django.db.models import Q
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from .models import Members, LeaveRequest, Shift, StaffShift, TaxBracket, Wage
+from .caching import bump_versions
+from .rollups import wages_written
+from .roster_cache import evict_months, months_of
+from .events import leaverequest_event, staffshift_event
+from .shift_registry import shift_registry
+from .tax import tax_tables
+
+
+def event_action(kwargs):
+    if kwargs['signal'] is post_delete:
+        return 'deleted'
+    return 'created' if kwargs.get('created') else 'updated'
+
+
+@receiver([post_save, post_delete], sender=Shift)
+def invalidate_shift_registry(sender, instance, **kwargs):
+    shift_registry.invalidate()
+    bump_versions('shift')
+    # only the months rostered with this template show its label
+    evict_months((day.year, day.month) for day in
+                 StaffShift.objects.filter(shift_id=instance.pk).dates('shift_date', 'month'))
+
+
+@receiver(pre_save, sender=StaffShift)
+def remember_staffshift_date(sender, instance, **kwargs):
+    # a shift moved to another month leaves the old month's cache stale too
+    instance._old_shift_date = None
+    if instance.pk:
+        instance._old_shift_date = StaffShift.objects.filter(pk=instance.pk).values_list('shift_date', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=StaffShift)
+def staffshift_changed(sender, instance, **kwargs):
+    bump_versions('staffshift')
+    old_shift_date = getattr(instance, '_old_shift_date', None)
+    evict_months(months_of([instance.shift_date, old_shift_date]))
+    staffshift_event(instance, event_action(kwargs), old_shift_date)
+
+
+@receiver([post_save, post_delete], sender=Members)
+def members_changed(sender, instance, **kwargs):
+    bump_versions('members')
+    # roster rows show the names of the staff and of who covers
+    shifts = StaffShift.objects.filter(Q(staff_id=instance.pk) | Q(alternative_staff_id=instance.pk))
+    evict_months((day.year, day.month) for day in shifts.dates('shift_date', 'month'))
+
+
+@receiver([post_save, post_delete], sender=LeaveRequest)
+def leaverequest_changed(sender, instance, **kwargs):
+    bump_versions('leaverequest')
+    leaverequest_event(instance, event_action(kwargs))
+
+
+@receiver([post_save, post_delete], sender=TaxBracket)
+def invalidate_tax_tables(sender, **kwargs):
+    tax_tables.invalidate()
+
+
+@receiver(pre_save, sender=Wage)
+def remember_wage_period(sender, instance, **kwargs):
+    # the rollups of the old staff / date need refreshing too when a Wage is moved
+    instance._rollup_keys = set()
+    if instance.pk:
+        instance._rollup_keys.update(Wage.objects.filter(pk=instance.pk).values_list('staff_id', 'shift_date'))
+
+
+@receiver([post_save, post_delete], sender=Wage)
+def wage_changed(sender, instance, **kwargs):
+    keys = getattr(instance, '_rollup_keys', set())
+    keys.add((instance.staff_id, instance.shift_date))
+    wages_written(keys)
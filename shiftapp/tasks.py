@@ -1,42 +1,194 @@
-from celery import shared_task
-from datetime import datetime, timedelta
-from models import *
-from django.db.models import F, Q
+import time
+from celery import shared_task, chord, group
+from celery.result import GroupResult
+from datetime import date, datetime, timedelta
+from .models import *
+from .roster_maker import generate_shifts_batch
+from django.utils import timezone
+from .tax import pay_week, withhold_tax
+from .payslips import generate_payslips
+from .payroll import claim_pay_run, pay_shifts, payable_shifts, payroll_chunks, resumable_pay_runs, resume_pay_run, run_payroll, unpaid_shifts_on
+from django.db.models import F, Min, Q
 import logging as log
 
 @shared_task
-def calculate_daily_salary():
+def calculate_daily_salary(mode=None):
     yesterday = datetime.now().date() - timedelta(days=1)
 
     print(f"start counting {yesterday}'s empolyee wages")
     log.info(f"start counting {yesterday}'s empolyee wages")
     
     log.info(f"filter {yesterday}'s StaffShift")
-    shifts = StaffShift.objects.filter(shift_date=yesterday, has_payslip=False)
-    if not shifts:
+    shifts = unpaid_shifts_on(yesterday)
+    if not shifts.exists():
         log.info(f"{yesterday}'s StaffShift does not exist")
         return True
-    wage = []
-    casual_rate = Decimal('1.25')
-    for s in shifts:
-        employee = s.staff if not s.cover_shift else s.alternative_staff
-        work_hours = s.shift.daily_work_hours()
-        pay_rate = employee.pay_rate
-        if employee.position_type == 'casual':
-            pay_rate = employee.pay_rate * casual_rate
-        wage.append(Wage(staff=employee, shift=s, 
-                         salary=work_hours*pay_rate, 
-                         shift_date=yesterday))
-
-    log.info(f"start generate {yesterday}'s Wage")
-    Wage.objects.bulk_create(wage)
-    print(f"{yesterday}'s wages have been generated")
-    log.info(f"{yesterday}'s wages have been generated")
-    
-    log.info(f"start mark off {yesterday}'s StaffShift")
-    shifts.update(has_payslip=True)
-    print(f"mark off {yesterday}'s StaffShift")
-    log.info(f"mark off {yesterday}'s StaffShift")
+
+    # Wage rows and has_payslip are written together in one transaction, tracked by a PayRun
+    log.info(f"start generate {yesterday}'s Wage and mark off StaffShift")
+    pay_run = run_payroll(yesterday, yesterday, kind='daily', mode=mode)
+    print(f"{yesterday}'s wages have been generated: {pay_run.rows_processed}")
+    log.info(f"{yesterday}'s wages have been generated: {pay_run.rows_processed} (pay run {pay_run.id})")
+
+    # week to date withholding, recomputed as the week's wages come in
+    week_start, week_end = pay_week(yesterday)
+    withhold_tax(week_start, week_end)
+    log.info(f"tax withheld for pay week {week_start} ~ {week_end}")
 
     log.info(f"{yesterday} - finalised")
-    return True
\ No newline at end of file
+    return True
+
+
+@shared_task
+def pay_shifts_chunk(start_date, end_date, staff_ids=None, mode=None):
+    """
+    Pay one backfill chunk. Chunks from payroll_chunks never overlap, so any number of them can
+    run on different workers at the same time.
+    """
+    started = time.perf_counter()
+    pay_run = run_payroll(date.fromisoformat(start_date), date.fromisoformat(end_date),
+                          kind='backfill', staff_ids=staff_ids, mode=mode)
+    created = pay_run.rows_processed
+    log.info(f"payroll chunk {start_date} ~ {end_date} ({len(staff_ids) if staff_ids else 'all'} staff): {created} wages")
+    return {'start_date': start_date, 'end_date': end_date, 'created': created, 'pay_run': pay_run.id,
+            'seconds': time.perf_counter() - started}
+
+
+@shared_task
+def summarise_payroll_backfill(results, started_at):
+    # withholding needs the whole week, so it runs once every chunk has committed
+    start = min(date.fromisoformat(result['start_date']) for result in results)
+    end = max(date.fromisoformat(result['end_date']) for result in results)
+    week_start = pay_week(start)[0]
+    while week_start <= end:
+        withhold_tax(week_start, week_start + timedelta(days=6))
+        week_start += timedelta(days=7)
+
+    elapsed = time.time() - started_at
+    created = sum(result['created'] for result in results)
+    summary = {
+        'chunks': len(results),
+        'created': created,
+        'seconds': round(elapsed, 2),
+        'wages_per_second': round(created / elapsed, 1) if elapsed else None,
+    }
+    log.info(f"payroll backfill finished: {summary}")
+    return summary
+
+
+@shared_task
+def backfill_payroll(start_date, end_date, chunk='day', staff_chunk_size=50, mode=None):
+    """
+    Pay every unpaid shift between start_date and end_date (ISO dates), e.g. the days missed
+    while beat or redis was down. Chunks run as a celery chord, the callback reports throughput.
+    """
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if start > end:
+        raise ValueError("start_date later than end_date")
+
+    chunks = [pay_shifts_chunk.s(s.isoformat(), e.isoformat(), staff_ids, mode)
+              for s, e, staff_ids in payroll_chunks(start, end, by=chunk, staff_chunk_size=staff_chunk_size)]
+    if not chunks:
+        log.info(f"payroll backfill {start_date} ~ {end_date}: nothing to pay")
+        return {'chunks': 0}
+
+    log.info(f"payroll backfill {start_date} ~ {end_date}: {len(chunks)} chunk(s) by {chunk}")
+    result = chord(group(chunks))(summarise_payroll_backfill.s(time.time()))
+    # keep the header group so payroll_backfill_progress can look it up later
+    result.parent.save()
+    return {'chunks': len(chunks), 'group_id': result.parent.id, 'summary_id': result.id}
+
+
+def payroll_backfill_progress(group_id):
+    group_result = GroupResult.restore(group_id)
+    if group_result is None:
+        return None
+    completed = group_result.completed_count()
+    total = len(group_result.results)
+    return {'completed': completed, 'total': total, 'done': completed == total}
+
+
+@shared_task
+def drain_unpaid_shifts(until=None, batch_size=None, mode=None):
+    """
+    Pay every unpaid shift up to `until` (ISO date, default yesterday). Safe to run on as many
+    workers at once as needed: each claims its own batches with SKIP LOCKED.
+    """
+    until = date.fromisoformat(until) if until else datetime.now().date() - timedelta(days=1)
+    started = time.perf_counter()
+    shifts = StaffShift.objects.filter(shift_date__lte=until)
+    # the run covers every unpaid shift up to until, from the oldest one
+    first_day = payable_shifts(shifts.filter(has_payslip=False)).aggregate(first=Min('shift_date'))['first']
+    pay_run = PayRun.objects.create(kind='drain', start_date=first_day or until, end_date=until)
+    try:
+        created = pay_shifts(shifts, mode=mode,
+                             batch_size=batch_size, pay_run=pay_run)
+    except Exception as e:
+        PayRun.objects.filter(pk=pay_run.pk).update(status='failed', error=repr(e), finished_at=timezone.now())
+        raise
+    PayRun.objects.filter(pk=pay_run.pk).update(status='succeeded', last_checkpoint=until, finished_at=timezone.now())
+    log.info(f"payroll worker paid {created} shift(s) up to {until} in {time.perf_counter() - started:.2f}s")
+    return created
+
+
+@shared_task
+def resume_failed_pay_runs(mode=None):
+    """
+    Carry on every failed or stale pay run from its last checkpoint. A stale drain is only
+    marked failed: the next drain picks up whatever it left unpaid.
+    """
+    resumed = []
+    for pay_run in resumable_pay_runs():
+        if pay_run.kind == 'drain':
+            if pay_run.status == 'running' and claim_pay_run(pay_run):
+                log.warning(f"{pay_run} stopped making progress, marked failed")
+                PayRun.objects.filter(pk=pay_run.pk).update(status='failed', error='worker stopped without finishing',
+                                                            finished_at=timezone.now())
+            continue
+        if not claim_pay_run(pay_run):
+            continue
+        log.info(f"resume {pay_run} from {pay_run.next_day()}")
+        resumed.append(resume_pay_run(pay_run.id, mode=mode).id)
+    return resumed
+
+
+@shared_task
+def withhold_weekly_tax(week_start=None):
+    """
+    Recompute tax_withheld for one pay week (Monday ISO date, default last week).
+    """
+    day = date.fromisoformat(week_start) if week_start else datetime.now().date() - timedelta(days=7)
+    week_start, week_end = pay_week(day)
+    written = withhold_tax(week_start, week_end)
+    log.info(f"tax withheld on {written} wage(s) for pay week {week_start} ~ {week_end}")
+    return written
+
+
+@shared_task
+def generate_payslips_task(period_start=None, period_end=None, workers=None):
+    """
+    Render payslips for a pay period (ISO dates, default last pay week).
+    """
+    if period_start and period_end:
+        period_start, period_end = date.fromisoformat(period_start), date.fromisoformat(period_end)
+    else:
+        period_start, period_end = pay_week(datetime.now().date() - timedelta(days=7))
+    written = generate_payslips(period_start, period_end, workers=workers)
+    log.info(f"{written} payslip(s) generated for {period_start} ~ {period_end}")
+    return written
+
+
+@shared_task
+def generate_roster_batch(year, month, months=3, workers=None, compare_serial=False):
+    """
+    Generate `months` months of roster from year/month, see generate_shifts_batch.
+
+    Under celery's default prefork pool the task runs in a daemonic child process, which may
+    not start a process pool, so the months are solved one after another ('process_pool' is
+    False in the report). To solve them in parallel run the worker with --pool=solo or
+    --pool=threads, or call generate_shifts_batch outside celery.
+    """
+    log.info(f"start generating {months} month(s) of roster from {year}-{month:02d}")
+    report = generate_shifts_batch(year, month, months=months, workers=workers, compare_serial=compare_serial)
+    log.info(f"roster batch finished: {report}")
+    return report
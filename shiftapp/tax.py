@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+
+from .models import TaxBracket, Wage
+
+CENT = Decimal('0.01')
+DOLLAR = Decimal('1')
+
+
+class TaxTable:
+    """
+    One version of the withholding scale, brackets sorted by earnings_from so the bracket of a
+    weekly amount is a single bisect.
+    """
+
+    def __init__(self, version, effective_from, brackets):
+        brackets = sorted(brackets)
+        self.version = version
+        self.effective_from = effective_from
+        self.bounds = [earnings_from for earnings_from, _, _ in brackets]
+        self.coefficients = [(a, b) for _, a, b in brackets]
+
+    def weekly_withholding(self, earnings):
+        """
+        ATO formula: drop the cents, add 99 cents, y = a * x - b, rounded to the dollar.
+        """
+        if earnings <= 0 or not self.bounds:
+            return Decimal('0')
+        x = earnings.quantize(DOLLAR, rounding=ROUND_DOWN) + Decimal('0.99')
+        i = bisect_right(self.bounds, x) - 1
+        if i < 0:
+            return Decimal('0')
+        a, b = self.coefficients[i]
+        return max((a * x - b).quantize(DOLLAR, rounding=ROUND_HALF_UP), Decimal('0'))
+
+
+class TaxTableRegistry:
+    """
+    Every TaxBracket version loaded with one query and kept until a bracket changes
+    (see signals.py).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None
+
+    def _load(self):
+        rows = defaultdict(list)
+        for bracket in TaxBracket.objects.order_by('effective_from', 'earnings_from'):
+            rows[(bracket.effective_from, bracket.version)].append(
+                (bracket.earnings_from, bracket.coefficient_a, bracket.coefficient_b))
+        return [TaxTable(version, effective_from, brackets)
+                for (effective_from, version), brackets in sorted(rows.items())]
+
+    def tables(self):
+        tables = self._tables
+        if tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = self._load()
+                tables = self._tables
+        return tables
+
+    def for_date(self, day):
+        """
+        The newest table already in effect on `day`.
+        """
+        tables = self.tables()
+        i = bisect_right([table.effective_from for table in tables], day) - 1
+        return tables[i] if i >= 0 else None
+
+    def invalidate(self):
+        with self._lock:
+            self._tables = None
+
+
+tax_tables = TaxTableRegistry()
+
+
+def pay_week(day):
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
+
+
+def withhold_tax(period_start, period_end, batch_size=1000):
+    """
+    Fill Wage.tax_withheld for every Wage in the pay period in one pass: each staff member's
+    earnings are totalled, withholding is worked out on the weekly equivalent, and the amount is
+    split over their Wage rows in proportion to salary. Safe to re-run, it recomputes the period.
+    Returns the number of Wage rows written.
+    """
+    table = tax_tables.for_date(period_start)
+    if table is None:
+        return 0
+
+    days = Decimal((period_end - period_start).days + 1)
+    weeks = days / Decimal('7')
+
+    wages = list(Wage.objects.filter(shift_date__range=(period_start, period_end))
+                 .only('id', 'staff_id', 'shift_date', 'salary', 'tax_withheld').order_by('staff_id', 'id'))
+
+    by_staff = defaultdict(list)
+    for wage in wages:
+        by_staff[wage.staff_id].append(wage)
+
+    for staff_wages in by_staff.values():
+        earnings = sum((wage.salary for wage in staff_wages), Decimal('0'))
+        withholding = table.weekly_withholding(earnings / weeks) * weeks
+        withholding = withholding.quantize(CENT, rounding=ROUND_HALF_UP)
+
+        remaining = withholding
+        for wage in staff_wages[:-1]:
+            share = (withholding * wage.salary / earnings).quantize(CENT, rounding=ROUND_HALF_UP) if earnings else Decimal('0')
+            wage.tax_withheld = share
+            remaining -= share
+        # the last row takes the rounding difference so the rows add up to the period's amount
+        staff_wages[-1].tax_withheld = max(remaining, Decimal('0'))
+
+    Wage.objects.bulk_update(wages, ['tax_withheld'], batch_size=batch_size)
+
+    from .rollups import wages_written
+    wages_written({(wage.staff_id, wage.shift_date) for wage in wages}, batch_size=batch_size)
+    return len(wages)
@@ -1,3 +1,364 @@
-from django.test import TestCase
+from collections import defaultdict
+from datetime import date, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .caching import bump_versions
+from .models import Members, PayRun, PublicHoliday, Shift, StaffShift, Wage, WageRollup
+from .payroll import PAYROLL_MODES, pay_shifts, split_overtime
+from .roster_maker import generate_shifts, generate_shifts_batch, month_problem, preview_roster
+from .roster_solver import solve_month
+from .shift_registry import shift_registry
+from .tax import tax_tables, withhold_tax
+from .tasks import drain_unpaid_shifts, resume_failed_pay_runs
+
+
+# the configured caches live on disk and outlive the test database
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test'},
+    'roster': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-roster'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class StaffShiftBulkTests(APITestCase):
+
+    def setUp(self):
+        self.admin = Members.objects.create_user(
+            username='admin', email='admin@example.com', password='pass', is_staff=True)
+        self.staff = Members.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', first_name='Amy')
+        self.morning = Shift.objects.create(shift_name='Morning', start_time=time(8), end_time=time(12))
+        self.evening = Shift.objects.create(shift_name='Evening', start_time=time(18), end_time=time(22))
+        self.client.force_authenticate(self.admin)
+
+    def test_create_only(self):
+        response = self.client.post('/staffshift/bulk/', {'create': [
+            {'shift_date': '2025-03-03', 'staff': self.staff.id, 'shift': self.morning.id},
+            {'shift_date': '2025-03-04', 'staff': self.staff.id, 'shift': self.morning.id},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row['shift_date'] for row in response.data['create']], ['2025-03-03', '2025-03-04'])
+        self.assertEqual(response.data['create'][0]['staff_name'], 'Amy')
+        self.assertEqual(StaffShift.objects.filter(staff=self.staff).count(), 2)
+
+    def test_create_update_delete(self):
+        moved = StaffShift.objects.create(shift_date=date(2025, 3, 3), staff=self.staff, shift=self.morning)
+        dropped = StaffShift.objects.create(shift_date=date(2025, 3, 4), staff=self.staff, shift=self.morning)
+
+        response = self.client.post('/staffshift/bulk/', {
+            'create': [{'shift_date': '2025-03-05', 'staff': self.staff.id, 'shift': self.morning.id}],
+            'update': [{'id': moved.id, 'shift': self.evening.id}],
+            'delete': [dropped.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['update'][0]['shift'], self.evening.id)
+        self.assertEqual(response.data['delete'], [dropped.id])
+        self.assertEqual(sorted(StaffShift.objects.values_list('shift_date', 'shift_id')),
+                         [(date(2025, 3, 3), self.evening.id), (date(2025, 3, 5), self.morning.id)])
+
+    def test_evicts_the_cached_month(self):
+        def march_shifts():
+            response = self.client.get('/staffshift/calendar/', {'year': 2025, 'month': 3})
+            return [shift['shift_date'] for week in response.data['weeks'] for day in week['days']
+                    for shift in day['shifts']]
+
+        self.assertEqual(march_shifts(), [])
+        self.client.post('/staffshift/bulk/', {'create': [
+            {'shift_date': '2025-03-03', 'staff': self.staff.id, 'shift': self.morning.id},
+        ]}, format='json')
+
+        self.assertEqual(march_shifts(), ['2025-03-03'])
+
+    def test_errors_are_per_item_and_nothing_is_saved(self):
+        response = self.client.post('/staffshift/bulk/', {'create': [
+            {'shift_date': '2025-03-03', 'staff': self.staff.id, 'shift': self.morning.id},
+            {'shift_date': '2025-03-03', 'staff': self.staff.id, 'shift': self.morning.id},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['create'][0], {})
+        self.assertIn('non_field_errors', response.data['create'][1])
+        self.assertFalse(StaffShift.objects.exists())
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ShiftRegistryTests(TestCase):
+
+    def test_reloads_when_another_process_changes_a_shift(self):
+        shift = Shift.objects.create(shift_name='Morning', start_time=time(8), end_time=time(12))
+        self.assertEqual(shift_registry.get(shift.id).shift_name, 'Morning')
+
+        # what a write in another process leaves behind: the row and the shared version, no signal here
+        Shift.objects.filter(id=shift.id).update(shift_name='Early')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions('shift')
+        shift_registry._checked_at = 0
+
+        self.assertEqual(shift_registry.get(shift.id).shift_name, 'Early')
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PayrollModeTests(TestCase):
+
+    def test_modes_round_half_cents_alike(self):
+        # 4.5 hours at 26.57 is 119.565, half-even would give 119.56
+        shift = Shift.objects.create(shift_name='Morning', start_time=time(8), end_time=time(12, 30))
+        salaries = {}
+        for i, mode in enumerate(PAYROLL_MODES):
+            staff = Members.objects.create_user(username=mode, email=f'{mode}@example.com', password='pass',
+                                                position_type='part', pay_rate=Decimal('26.57'))
+            staffshift = StaffShift.objects.create(shift_date=date(2025, 3, 3 + i), staff=staff, shift=shift)
+            pay_shifts(StaffShift.objects.filter(id=staffshift.id), mode=mode)
+            salaries[mode] = Wage.objects.get(shift=staffshift).salary
+
+        self.assertEqual(salaries, {mode: Decimal('119.57') for mode in PAYROLL_MODES})
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PayslipDownloadTests(APITestCase):
+
+    def test_staff_id_must_be_an_id(self):
+        admin = Members.objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        self.client.force_authenticate(admin)
+
+        response = self.client.get('/wage/payslip/', {'start_date': '2025-03-01', 'end_date': '2025-03-31',
+                                                      'staff_id': '../../shift/settings'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('staff_id', response.data)
+
+
+@override_settings(CACHES=LOCAL_CACHES, PAY_RUN_STALE_MINUTES=60)
+class PayRunResumeTests(TestCase):
+
+    def setUp(self):
+        staff = Members.objects.create_user(username='staff', email='staff@example.com', password='pass')
+        shift = Shift.objects.create(shift_name='Morning', start_time=time(8), end_time=time(12))
+        self.shifts = [StaffShift.objects.create(shift_date=date(2025, 3, day), staff=staff, shift=shift)
+                       for day in (3, 4)]
+
+    def test_resumes_a_run_whose_worker_died(self):
+        # killed after paying the 3rd: still 'running', last heard of two hours ago
+        pay_run = PayRun.objects.create(kind='backfill', start_date=date(2025, 3, 3), end_date=date(2025, 3, 4),
+                                        last_checkpoint=date(2025, 3, 3))
+        PayRun.objects.filter(pk=pay_run.pk).update(checkpoint_at=timezone.now() - timedelta(hours=2))
+
+        self.assertEqual(resume_failed_pay_runs(), [pay_run.id])
+        pay_run.refresh_from_db()
+        self.assertEqual(pay_run.status, 'succeeded')
+        self.assertEqual(list(Wage.objects.values_list('shift_date', flat=True)), [date(2025, 3, 4)])
+
+    def test_leaves_a_live_run_alone(self):
+        PayRun.objects.create(kind='backfill', start_date=date(2025, 3, 3), end_date=date(2025, 3, 4),
+                              checkpoint_at=timezone.now())
+
+        self.assertEqual(resume_failed_pay_runs(), [])
+        self.assertFalse(Wage.objects.exists())
+
+    def test_drain_records_the_range_it_pays(self):
+        drain_unpaid_shifts('2025-03-10')
+
+        pay_run = PayRun.objects.get(kind='drain')
+        self.assertEqual((pay_run.start_date, pay_run.end_date), (date(2025, 3, 3), date(2025, 3, 10)))
+        self.assertEqual(pay_run.rows_processed, 2)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class WageSummaryTests(APITestCase):
+
+    def test_totals_are_in_cents(self):
+        admin = Members.objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        for day, salary in ((3, '0.10'), (4, '0.20')):
+            WageRollup.objects.create(staff=admin, period_type='day', period_start=date(2025, 3, day),
+                                      period_end=date(2025, 3, day), shifts=1, hours=Decimal('4.00'),
+                                      salary=Decimal(salary), tax_withheld=Decimal('0.00'))
+        self.client.force_authenticate(admin)
+
+        response = self.client.get('/wage/summary/', {'period': 'day', 'start_date': '2025-03-01',
+                                                      'end_date': '2025-03-31'})
+
+        self.assertEqual(response.data['totals'], {'shifts': 2, 'hours': Decimal('8.00'), 'salary': Decimal('0.30'),
+                                                   'tax_withheld': Decimal('0.00')})
+        self.assertEqual(str(response.data['totals']['salary']), '0.30')
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class WithholdingTests(TestCase):
+
+    def test_scale_2_at_bracket_edges(self):
+        # the 2024-25 scale 2 loaded by migration 0013; x is the whole dollars plus 99 cents
+        table = tax_tables.for_date(date(2025, 3, 3))
+        cases = {
+            '0': '0',
+            '360.99': '0',       # x = 360.99, under the tax-free threshold
+            '361.00': '0',       # 0.16 * 361.99 - 57.8462 = 0.07
+            '499.50': '22',      # last dollar of the 0.16 bracket
+            '500.00': '22',      # 0.26 * 500.99 - 107.8462 = 22.41
+            '1000.00': '143',
+            '1281.99': '234',    # 0.3227 * 1281.99 - 180.0385 = 233.66
+            '1282.00': '234',    # 0.32 * 1282.99 - 176.5769 = 233.98
+            '3653.00': '1067',   # top bracket
+        }
+        for earnings, withholding in cases.items():
+            with self.subTest(earnings=earnings):
+                self.assertEqual(table.weekly_withholding(Decimal(earnings)), Decimal(withholding))
+
+    def test_week_is_split_over_the_wages_by_salary(self):
+        staff = Members.objects.create_user(username='staff', email='staff@example.com', password='pass')
+        shift = Shift.objects.create(shift_name='Morning', start_time=time(8), end_time=time(12))
+        for day, salary in ((3, '600.00'), (4, '400.00')):
+            staffshift = StaffShift.objects.create(shift_date=date(2025, 3, day), staff=staff, shift=shift)
+            Wage.objects.create(staff=staff, shift=staffshift, shift_date=staffshift.shift_date, salary=Decimal(salary))
+
+        self.assertEqual(withhold_tax(date(2025, 3, 3), date(2025, 3, 9)), 2)
+        self.assertEqual(list(Wage.objects.order_by('shift_date').values_list('tax_withheld', flat=True)),
+                         [Decimal('85.80'), Decimal('57.20')])
+
+
+OVERTIME_TIERS = [(Decimal('2'), Decimal('1.50')), (None, Decimal('2.00'))]
+
+
+class SplitOvertimeTests(TestCase):
+
+    def test_across_the_tiers(self):
+        cases = {
+            # hours worked earlier in the week: parts of an 8 hour shift
+            '36': [(2, None), (2, '1.50'), (4, '2.00')],
+            '38': [(2, '1.50'), (6, '2.00')],
+            '39': [(1, '1.50'), (7, '2.00')],
+        }
+        for hours_before, parts in cases.items():
+            with self.subTest(hours_before=hours_before):
+                self.assertEqual(split_overtime(Decimal(hours_before), Decimal('8'), Decimal('38'), OVERTIME_TIERS),
+                                 [(Decimal(hours), Decimal(multiplier) if multiplier else None) for hours, multiplier in parts])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RatesModeTests(TestCase):
+
+    def setUp(self):
+        self.shift = Shift.objects.create(shift_name='Day', start_time=time(8), end_time=time(16))
+        self.part = Members.objects.create_user(username='part', email='part@example.com', password='pass',
+                                                position_type='part', pay_rate=Decimal('30.00'))
+        self.casual = Members.objects.create_user(username='casual', email='casual@example.com', password='pass',
+                                                  position_type='casual', pay_rate=Decimal('30.00'))
+
+    def roster(self, staff, *days, **fields):
+        return [StaffShift.objects.create(shift_date=day, staff=staff, shift=self.shift, **fields) for day in days]
+
+    def pay(self, mode, staffshifts):
+        pay_shifts(StaffShift.objects.filter(id__in=[staffshift.id for staffshift in staffshifts]), mode=mode)
+        return [Wage.objects.get(shift=staffshift).salary for staffshift in staffshifts]
+
+    def test_penalty_rates(self):
+        PublicHoliday.objects.create(holiday_date=date(2025, 3, 10), name='Canberra Day')
+        # Friday, Saturday, Sunday, then the Monday public holiday of the next week
+        shifts = self.roster(self.part, date(2025, 3, 7), date(2025, 3, 8), date(2025, 3, 9), date(2025, 3, 10))
+        casual = self.roster(self.casual, date(2025, 3, 8))
+
+        self.assertEqual(self.pay('rates', shifts + casual),
+                         [Decimal(salary) for salary in ('240.00', '300.00', '360.00', '540.00', '375.00')])
+
+    def test_weekly_overtime(self):
+        # five 8 hour weekdays: the fifth has 6 ordinary hours and 2 at time and a half
+        shifts = self.roster(self.part, *[date(2025, 3, day) for day in range(3, 8)])
+
+        self.assertEqual(self.pay('rates', shifts)[-1], Decimal('270.00'))
+
+    def test_modes_agree_on_ordinary_weekdays(self):
+        shifts = (self.roster(self.part, date(2025, 3, 3), date(2025, 3, 4)) +
+                  self.roster(self.casual, date(2025, 3, 5)) +
+                  self.roster(self.part, date(2025, 3, 6), cover_shift=True, alternative_staff=self.casual))
+        salaries = {}
+        for mode in PAYROLL_MODES:
+            salaries[mode] = self.pay(mode, shifts)
+            Wage.objects.all().delete()
+            StaffShift.objects.update(has_payslip=False)
+
+        self.assertEqual(salaries['set'], [Decimal('240.00'), Decimal('240.00'), Decimal('300.00'), Decimal('300.00')])
+        self.assertEqual(salaries['python'], salaries['set'])
+        self.assertEqual(salaries['rates'], salaries['set'])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RosterBatchTests(TestCase):
+
+    def setUp(self):
+        Members.objects.create_user(username='manager', email='manager@example.com', password='pass',
+                                    position_type='full')
+        Members.objects.create_user(username='full', email='full@example.com', password='pass', position_type='full')
+        self.casuals = [Members.objects.create_user(username=f'casual{i}', email=f'casual{i}@example.com',
+                                                    password='pass', position_type='casual') for i in range(6)]
+        for name, start, end in (('Morning Shift', 7, 15), ('Middle Shift', 10, 18), ('Afternoon Shift', 15, 23),
+                                 ('Weekend Morning', 7, 15), ('Weekend Midday', 11, 19),
+                                 ('Weekend Helper A', 9, 13), ('Weekend Helper B', 13, 17)):
+            Shift.objects.create(shift_name=name, start_time=time(start), end_time=time(end))
+
+    def test_a_problem_solves_the_same_twice(self):
+        problem = month_problem(2025, 3)
+
+        first, second = solve_month(problem), solve_month(problem)
+
+        self.assertEqual(first['rows'], second['rows'])
+        self.assertEqual(first['uncovered'], second['uncovered'])
+
+    def test_a_conflict_only_fails_its_own_month(self):
+        # a manually added stocktake overlaps the morning April's roster gives the manager on the 1st
+        stocktake = Shift.objects.create(shift_name='Stocktake', start_time=time(9), end_time=time(13))
+        StaffShift.objects.create(shift_date=date(2025, 4, 1), staff=Members.objects.get(username='manager'),
+                                  shift=stocktake)
+
+        report = generate_shifts_batch(2025, 3, months=2, workers=1)
+
+        self.assertEqual(report['saved'], ['2025-03'])
+        self.assertEqual(list(report['failed']), ['2025-04'])
+        self.assertTrue(StaffShift.objects.filter(shift_date__month=3).exists())
+        self.assertEqual(StaffShift.objects.filter(shift_date__month=4).count(), 1)
+
+    def test_weekly_cap_spans_the_month_boundary(self):
+        casual = self.casuals[0]
+        Members.objects.exclude(id=casual.id).filter(position_type='casual').update(is_active=False)
+        after = Shift.objects.get(shift_name='Afternoon Shift')
+        # May's roster already has them three afternoons in the ISO week that starts on Monday 28 April
+        for day in (1, 2, 3):
+            StaffShift.objects.create(shift_date=date(2025, 5, day), staff=casual, shift=after)
+
+        rows = solve_month(month_problem(2025, 4))['rows']
+
+        week = [day for day, staff_id, shift_id in rows if staff_id == casual.id and day >= date(2025, 4, 28)]
+        self.assertEqual(len(week), 1)
+
+    def coverage(self):
+        slots = defaultdict(int)
+        for day, shift_id in StaffShift.objects.values_list('shift_date', 'shift_id'):
+            slots[(day, shift_id)] += 1
+        return dict(slots)
+
+    def test_regenerating_a_saved_month(self):
+        generate_shifts(2025, 3)
+        coverage = self.coverage()
+        paid = StaffShift.objects.filter(staff__position_type='casual').order_by('shift_date').first()
+        StaffShift.objects.filter(id=paid.id).update(has_payslip=True)
+        Members.objects.create_user(username='new', email='new@example.com', password='pass', position_type='casual')
+
+        generate_shifts(2025, 3)
+
+        self.assertEqual(self.coverage(), coverage)
+        self.assertTrue(StaffShift.objects.filter(id=paid.id, staff_id=paid.staff_id).exists())
+        self.assertTrue(StaffShift.objects.filter(staff__username='new').exists())
+
+    def test_regenerating_is_idempotent(self):
+        generate_shifts(2025, 3)
+        saved = set(StaffShift.objects.values_list('id', 'shift_date', 'staff_id', 'shift_id'))
+
+        generate_shifts(2025, 3)
+
+        self.assertEqual(set(StaffShift.objects.values_list('id', 'shift_date', 'staff_id', 'shift_id')), saved)
+        diff = preview_roster(2025, 3)['diff']
+        self.assertEqual((diff['create'], diff['replace'], diff['not_in_proposal']), ([], [], []))
@@ -1,4 +1,5 @@
-from datetime import timedelta
+import multiprocessing
+from datetime import date, timedelta
 
 def calculate_end_date(start_date, dura):
     if not dura:
@@ -13,4 +14,18 @@ def calculate_end_date(start_date, dura):
     elif start_date.month in [4, 6, 9, 11]:
         return start_date + timedelta(29)
     else:
-        return start_date + timedelta(27)
\ No newline at end of file
+        return start_date + timedelta(27)
+
+
+def can_use_process_pool(workers):
+    """
+    False when work has to stay in this process: workers == 1, or we are a daemonic process,
+    like the children of celery's prefork pool, which may not start processes of their own.
+    """
+    return workers != 1 and not multiprocessing.current_process().daemon
+
+
+def as_date(day):
+    # unsaved StaffShift rows (the random roster strategy, or create(shift_date='...')) keep
+    # the ISO string they were given until they are read back
+    return date.fromisoformat(day) if isinstance(day, str) else day
@@ -1,10 +1,18 @@
+import re
+from decimal import Decimal
 import logging as log
 from datetime import datetime
+from calendar import monthrange
+from collections import defaultdict
 from django.conf import settings
+from django.db import IntegrityError
 from django.db.models import Sum
 from rest_framework import status
-from django.db.models import Max, Min
 from django.core.mail import send_mail
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 from rest_framework.views import APIView
 from django.utils.encoding import force_str
 from rest_framework.response import Response
@@ -14,13 +22,25 @@ from rest_framework.viewsets import ModelViewSet
 from django.utils.http import urlsafe_base64_encode
 from django.utils.http import urlsafe_base64_decode
 from django.core.exceptions import PermissionDenied
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
 from .utils import calculate_end_date
+from .payslips import PAYSLIP_FORMATS, payslip_path
+from .caching import wage_date_range
+from .conditional import ConditionalGetMixin
+from .conflicts import RosterConflictError
+from .events import broker, event_stream
+from .roster_cache import cached_month_response
+from .rollups import CENT, ROLLUP_PERIODS, rollup_totals
+from .exports import EXPORT_FORMATS, ROSTER_EXPORT_COLUMNS, WAGE_EXPORT_COLUMNS, export_response
+from .pagination import DateKeysetPagination, LeaveRequestPagination
+from .projections import staffshift_rows, staffshift_values, wage_rows, wage_values
+from .roster_maker import ROSTER_STRATEGIES, generate_monthly_weeks, generate_shifts, preview_roster
 from .permissions import IsAdminOrReadyOnly
 from .tokens import FiveMinuteTokenGenerator
-from .models import Members, Shift, StaffShift, LeaveRequest, LeaveBalance, Wage
-from .serializer import MemberSerializer, ShiftSerializer, StaffShiftSerializer, LeaveRequestSerializer, LeaveBalanceSerializer, WageSerializer
+from .models import Members, Shift, StaffShift, LeaveRequest, LeaveBalance, Wage, WageRollup
+from .serializer import MemberSerializer, ShiftSerializer, StaffShiftSerializer, LeaveRequestSerializer, LeaveBalanceSerializer, WageSerializer, WageRollupSerializer, StaffShiftBulkSerializer
 
 # universal function
 def str_to_date(date_str):
@@ -30,10 +50,43 @@ def str_to_date(date_str):
         return False
 
 
-class MemberViewSet(ModelViewSet):
+def export_filters(request, queryset, date_field='shift_date', staff_field='staff_id'):
+    """
+    start_date / end_date / staff query parameters shared by the export endpoints.
+    Returns (queryset, error response or None).
+    """
+    for param, lookup in (('start_date', 'gte'), ('end_date', 'lte')):
+        value = request.query_params.get(param)
+        if value:
+            day = str_to_date(value)
+            if not day:
+                return None, Response({param: 'must be YYYY-MM-DD'}, status=400)
+            queryset = queryset.filter(**{f'{date_field}__{lookup}': day})
+
+    staff = request.query_params.get('staff')
+    if staff:
+        if not staff.isdigit():
+            return None, Response({'staff': 'must be a staff id'}, status=400)
+        queryset = queryset.filter(**{staff_field: staff})
+    return queryset, None
+
+
+def roster_scope(request):
+    # who the roster rows are for: everyone, or the one staff member asked for
+    staff = request.query_params.get('staff')
+    return f'staff:{staff}' if staff else 'all'
+
+
+def export_format(request, default='csv'):
+    # not 'format', DRF keeps that query parameter for picking a renderer
+    return request.query_params.get('file_type', default)
+
+
+class MemberViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Members.objects.all()
     serializer_class = MemberSerializer
     permission_classes = [IsAuthenticated]
+    version_resources = ('members',)
 
     def get_queryset(self):
         user = self.request.user
@@ -47,22 +100,152 @@ class MemberViewSet(ModelViewSet):
         return super().update(request, *args, **kwargs)
 
 
-class ShiftViewSet(ModelViewSet):
+class ShiftViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Shift.objects.all()
     serializer_class = ShiftSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadyOnly]
+    version_resources = ('shift',)
 
 
-class StaffShiftViewSet(ModelViewSet):
-    queryset = StaffShift.objects.select_related('staff', 'shift', 'alternative_staff').all()
+class StaffShiftViewSet(ConditionalGetMixin, ModelViewSet):
+    queryset = StaffShift.objects.select_related('staff', 'alternative_staff').all()
     serializer_class = StaffShiftSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadyOnly]
+    pagination_class = DateKeysetPagination
+    # rows show staff names and shift labels too
+    version_resources = ('staffshift', 'members', 'shift')
+    conditional_actions = ('list', 'retrieve', 'calendar')
+
+    def list(self, request, *args, **kwargs):
+        """
+        ?start_date=&end_date=&staff= narrow the roster on the server, pages follow shift_date
+        """
+        queryset, error = export_filters(request, self.filter_queryset(self.get_queryset()))
+        if error:
+            return error
+
+        def build():
+            # read only, so rows come from .values() instead of StaffShiftSerializer
+            page = self.paginate_queryset(staffshift_values(queryset))
+            return self.get_paginated_response(staffshift_rows(page)).data
+
+        # reads inside one month are the same for everyone, cached until that month changes
+        start_date = str_to_date(request.query_params.get('start_date'))
+        end_date = str_to_date(request.query_params.get('end_date'))
+        if not start_date or not end_date or (start_date.year, start_date.month) != (end_date.year, end_date.month):
+            return Response(build())
+        return Response(cached_month_response(start_date.year, start_date.month, roster_scope(request),
+                                              request.build_absolute_uri(), build))
+
+    @action(detail=False, methods=['get'], url_path='calendar')
+    def calendar(self, request):
+        """
+        One month of the roster for the calendar view: ?year=&month=&staff=
+        grouped by the roster weeks of generate_monthly_weeks, then by day.
+        """
+        try:
+            year = int(request.query_params.get('year'))
+            month = int(request.query_params.get('month'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'year and month are required'}, status=400)
+        if not 1 <= month <= 12:
+            return Response({'month': 'must be between 1 and 12'}, status=400)
+
+        first_day = datetime(year, month, 1).date()
+        last_day = first_day.replace(day=monthrange(year, month)[1])
+        queryset = self.get_queryset().filter(shift_date__range=(first_day, last_day))
+
+        staff = request.query_params.get('staff')
+        if staff:
+            if not staff.isdigit():
+                return Response({'staff': 'must be a staff id'}, status=400)
+            queryset = queryset.filter(staff_id=staff)
+
+        def build():
+            # the whole month in one query, names joined in SQL, grouped into weeks in python
+            by_day = defaultdict(list)
+            for shift in staffshift_rows(staffshift_values(queryset.order_by('shift_date', 'shift__start_time', 'id'))):
+                by_day[shift['shift_date']].append(shift)
+
+            weeks = []
+            for week in generate_monthly_weeks(year, month):
+                days = sorted(week['weekdays'] + week['saturdays'] + week['sundays'])
+                weeks.append({
+                    'start_date': days[0],
+                    'end_date': days[-1],
+                    'days': [{'date': day, 'shifts': by_day.get(day, [])} for day in days],
+                })
+            return {'year': year, 'month': month, 'weeks': weeks}
+
+        return Response(cached_month_response(year, month, roster_scope(request), 'calendar', build), status=200)
+
+    @action(detail=False, methods=['post'], url_path='bulk', permission_classes=[IsAuthenticated, IsAdminUser])
+    def bulk(self, request):
+        """
+        Apply a batch of roster edits in one transaction:
+        {"create": [{shift_date, staff, shift, cover_shift, alternative_staff}],
+         "update": [{id, ...changed fields}], "delete": [id, ...]}
+        Errors come back per item, in request order, and nothing is saved.
+        """
+        serializer = StaffShiftBulkSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        try:
+            results = serializer.save()
+        except IntegrityError as e:
+            log.warning(f"bulk roster edit rejected: {e}")
+            return Response({'detail': 'staff already has this shift on this date'}, status=409)
+        return Response(results, status=200)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream the roster: ?file_type=csv|ndjson&start_date=&end_date=&staff=
+        """
+        fmt = export_format(request)
+        if fmt not in EXPORT_FORMATS:
+            return Response({'file_type': f'choose from {EXPORT_FORMATS}'}, status=400)
+        queryset, error = export_filters(request, StaffShift.objects.order_by('shift_date', 'id'))
+        if error:
+            return error
+        return export_response(queryset, ROSTER_EXPORT_COLUMNS, fmt, 'roster')
+
+    @action(detail=False, methods=['get', 'post'], url_path='generate', permission_classes=[IsAuthenticated, IsAdminUser])
+    def generate(self, request):
+        """
+        GET (or dry_run=1): preview the month's roster and its diff against saved rows.
+        POST with dry_run=0: save it, re-running the same month does not duplicate rows.
+        """
+        params = request.query_params if request.method == 'GET' else request.data
+        try:
+            year = int(params.get('year'))
+            month = int(params.get('month'))
+        except (TypeError, ValueError):
+            return Response({'detail': 'year and month are required'}, status=400)
+        if not 1 <= month <= 12:
+            return Response({'month': 'must be between 1 and 12'}, status=400)
+
+        strategy = params.get('strategy', 'solver')
+        if strategy not in ROSTER_STRATEGIES:
+            return Response({'strategy': f'choose from {sorted(ROSTER_STRATEGIES)}'}, status=400)
 
+        dry_run = request.method == 'GET' or str(params.get('dry_run', '1')).lower() in ['1', 'true', 'yes']
+        if dry_run:
+            return Response(preview_roster(year, month, strategy), status=200)
 
-class LeaveRequestViewSet(ModelViewSet):
+        try:
+            staffshifts = generate_shifts(year, month, strategy)
+        except RosterConflictError as e:
+            return Response({'detail': str(e), 'conflicts': e.conflicts}, status=409)
+        return Response({'year': year, 'month': month, 'strategy': strategy,
+                         'saved': len(staffshifts)}, status=201)
+
+
+class LeaveRequestViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LeaveRequestPagination
+    version_resources = ('leaverequest', 'members')
 
     def get_queryset(self):
         user = self.request.user
@@ -92,12 +275,91 @@ class WageViewSet(ModelViewSet):
     queryset = Wage.objects.all()
     serializer_class = WageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DateKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         return Wage.objects.all() if user.is_superuser else Wage.objects.filter(staff=user)
     
 
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream the wage ledger: ?file_type=csv|ndjson&start_date=&end_date=&staff=
+        (non superusers only ever get their own rows)
+        """
+        fmt = export_format(request)
+        if fmt not in EXPORT_FORMATS:
+            return Response({'file_type': f'choose from {EXPORT_FORMATS}'}, status=400)
+        queryset, error = export_filters(request, self.get_queryset().order_by('shift_date', 'id'))
+        if error:
+            return error
+        return export_response(queryset, WAGE_EXPORT_COLUMNS, fmt, 'wages')
+
+    @action(detail=False, methods=['get'], url_path='summary')
+    def summary(self, request):
+        """
+        Wage totals per staff and period from the rollup table:
+        ?period=day|week|month&start_date=&end_date=&staff_id=
+        (non superusers only ever get their own rows)
+        """
+        period = request.query_params.get('period', 'week')
+        if period not in ROLLUP_PERIODS:
+            return Response({'period': f'choose from {ROLLUP_PERIODS}'}, status=400)
+
+        start_date = str_to_date(request.query_params.get('start_date'))
+        end_date = str_to_date(request.query_params.get('end_date'))
+        if not start_date or not end_date:
+            return Response({'detail': 'start_date and end_date are required'}, status=400)
+
+        # every period that overlaps the search period
+        rollups = WageRollup.objects.filter(period_type=period, period_start__lte=end_date, period_end__gte=start_date)
+        if not request.user.is_superuser:
+            rollups = rollups.filter(staff=request.user)
+        elif request.query_params.get('staff_id'):
+            rollups = rollups.filter(staff_id=request.query_params.get('staff_id'))
+
+        rollups = rollups.select_related('staff').order_by('period_start', 'staff_id')
+        totals = rollups.aggregate(shifts=Sum('shifts'), hours=Sum('hours'), salary=Sum('salary'),
+                                   tax_withheld=Sum('tax_withheld'))
+
+        return Response({'search_period': f'from {start_date} to {end_date}',
+                         'period': period,
+                         'totals': {key: (value or 0) if key == 'shifts' else Decimal(value or 0).quantize(CENT)
+                                    for key, value in totals.items()},
+                         'results': WageRollupSerializer(rollups, many=True).data,
+                         }, status=200)
+
+    @action(detail=False, methods=['get'], url_path='payslip')
+    def payslip(self, request):
+        """
+        Download a generated payslip: ?start_date=&end_date=&file_type=html|csv
+        (superusers may add staff_id to fetch someone else's)
+        """
+        start_date = str_to_date(request.query_params.get('start_date'))
+        end_date = str_to_date(request.query_params.get('end_date'))
+        if not start_date or not end_date:
+            return Response({'detail': 'start_date and end_date are required'}, status=400)
+
+        fmt = export_format(request, default='html')
+        if fmt not in PAYSLIP_FORMATS:
+            return Response({'file_type': f'choose from {PAYSLIP_FORMATS}'}, status=400)
+
+        staff_id = request.user.id
+        if request.user.is_superuser and request.query_params.get('staff_id'):
+            staff_id = request.query_params.get('staff_id')
+            # it becomes part of a file path
+            if not staff_id.isdigit():
+                return Response({'staff_id': 'must be a staff id'}, status=400)
+
+        path = payslip_path(start_date, end_date, staff_id, fmt)
+        if not path.is_file():
+            return Response({'detail': 'Payslip not generated for this period.'}, status=404)
+
+        content_type = 'text/html' if fmt == 'html' else 'text/csv'
+        return FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=True,
+                            filename=f'payslip_{start_date}_{end_date}.{fmt}')
+
     def list(self, request, *args, **kwargs):
 
         start_date_str = request.query_params.get('start_date')
@@ -130,7 +392,15 @@ class WageViewSet(ModelViewSet):
                 shift_date__lte=end_date
             )
 
-        if not queryset:
+        # count and total from the daily rollups, a few rows instead of the whole ledger
+        if not request.user.is_superuser:
+            staff_ids = [request.user.id]
+        else:
+            staff_ids = [staff_id] if staff_id else None
+        summary = rollup_totals(start_date, end_date, staff_ids)
+        days = summary['shifts']
+
+        if not days:
             today = datetime.today().date()
 
             return Response({'search_period': f'from {start_date} to {end_date}',
@@ -139,23 +409,22 @@ class WageViewSet(ModelViewSet):
                              'valid_date_til': today,
                             }, status=200)
         else:
-            shift_date_max = str(Wage.objects.aggregate(Max('shift_date'))['shift_date__max'] or '')
-            shift_date_min = str(Wage.objects.aggregate(Min('shift_date'))['shift_date__min'] or '')
-            days = len(queryset)
+            shift_date_min, shift_date_max = wage_date_range()
 
-            if days and days == 1:
+            if days == 1:
                 day_str = f'{days}_day_salary'
-            elif days and days > 1:
+            else:
                 day_str = f'{days}_days_salary'
-            total_salary = queryset.aggregate(total_salary=Sum('salary'))['total_salary']
 
-            serializer = self.get_serializer(queryset, many=True)
+            page = self.paginate_queryset(wage_values(queryset))
 
-            return Response({'shift_detail': serializer.data,
-                            day_str: round(total_salary, 2),
+            return Response({'shift_detail': wage_rows(page),
+                            'next': self.paginator.get_next_link(),
+                            'previous': self.paginator.get_previous_link(),
+                            day_str: round(summary['salary'], 2),
                             'search_period': f'from {start_date} to {end_date}',
-                            'valid_date_from': shift_date_min,
-                            'valid_date_til': shift_date_max,
+                            'valid_date_from': str(shift_date_min or ''),
+                            'valid_date_til': str(shift_date_max or ''),
                             }, status=200)
 
 
@@ -230,4 +499,50 @@ class PasswordResetTokenValidateView(APIView):
         if token_generator.check_token(user, token):
             return Response({'valid': True})
         else:
-            return Response({'valid': False}, status=400)
\ No newline at end of file
+            return Response({'valid': False}, status=400)
+
+
+# roster / leave change push (Server-Sent Events), needs an ASGI server, see shift/asgi.py
+MONTH_PARAM = re.compile(r'^\d{4}-\d{2}$')
+
+
+def jwt_user(request):
+    """
+    The user of an "Authorization: Bearer <access>" header, or of ?token=<access> since the
+    browser's EventSource can't send headers. None when missing or invalid.
+    """
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    raw_token = authenticator.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        return authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def roster_events(request):
+    """
+    GET /events/roster/?month=YYYY-MM&staff=<id>, both optional and repeatable.
+    Streams StaffShift and LeaveRequest changes of those months / staff as they are committed,
+    instead of the frontend polling the roster and leave lists.
+    """
+    user = await sync_to_async(jwt_user)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+    months = request.GET.getlist('month')
+    if any(not MONTH_PARAM.match(month) for month in months):
+        return JsonResponse({'month': 'must be YYYY-MM'}, status=400)
+    staff = request.GET.getlist('staff')
+    if any(not staff_id.isdigit() for staff_id in staff):
+        return JsonResponse({'staff': 'must be a staff id'}, status=400)
+
+    subscription = broker.subscribe(months=months, staff=[int(staff_id) for staff_id in staff],
+                                    user_id=user.id, is_staff=user.is_staff)
+    response = StreamingHttpResponse(event_stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would otherwise buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response